@@ -0,0 +1,147 @@
+"""Z-score策略回测：用数组运算把信号转换成买卖点和交易流水"""
+import numpy as np
+
+from bars import format_dates
+
+INITIAL_CASH = 1000000.0  # 初始本金100万
+WARMUP = 200              # 前200个数据点只用于积累统计量，不交易
+BUY_THRESHOLD = 1.0       # zScore高于此值买入
+SELL_THRESHOLD = -1.0     # zScore低于此值卖出
+
+
+def holding_state(z_scores, buy_threshold=BUY_THRESHOLD, sell_threshold=SELL_THRESHOLD, warmup=WARMUP):
+    """
+    计算每个数据点收盘后是否持仓
+
+    空仓时 z > buy_threshold 买入，持仓时 z < sell_threshold 卖出。
+    要求 buy_threshold >= sell_threshold，此时同一天不会同时出现买卖信号，
+    持仓状态等于"最近一次信号"的前向填充。z为NaN的点不产生信号。
+    z_scores也可以是 日期×股票 的二维矩阵，此时按列分别计算。
+    """
+    if buy_threshold < sell_threshold:
+        raise ValueError(f"买入阈值({buy_threshold})不能低于卖出阈值({sell_threshold})")
+    z_scores = np.asarray(z_scores, dtype=np.float64)
+    return signal_state(z_scores > buy_threshold, z_scores < sell_threshold, warmup)
+
+
+def signal_state(buy, sell, warmup=WARMUP):
+    """
+    由买入、卖出信号（布尔数组，一维或 日期×股票 二维）计算每个数据点收盘后是否持仓
+
+    空仓时遇到买入信号买入，持仓时遇到卖出信号卖出；同一天两种信号都有时按卖出处理。
+    """
+    buy = np.asarray(buy, dtype=bool)
+    sell = np.asarray(sell, dtype=bool)
+    n = len(buy)
+    bars = np.arange(n).reshape((n,) + (1,) * (buy.ndim - 1))
+    signal = np.full(buy.shape, -1, dtype=np.int8)  # -1: 无信号, 1: 买入, 0: 卖出
+    tradable = bars >= warmup
+    signal[tradable & buy] = 1
+    signal[tradable & sell] = 0
+
+    # 沿日期方向前向填充最近一次信号
+    last = np.where(signal >= 0, bars, -1)
+    last = np.maximum.accumulate(last, axis=0) if n else last
+    return (last >= 0) & (np.take_along_axis(signal, np.maximum(last, 0), axis=0) == 1)
+
+
+def trade_points(held):
+    """由持仓状态得到买入、卖出下标；期末仍持仓时在最后一个数据点平仓"""
+    held = np.asarray(held, dtype=np.int8)
+    change = np.diff(np.concatenate(([0], held)))
+    entries = np.flatnonzero(change == 1)
+    exits = np.flatnonzero(change == -1)
+    if len(exits) < len(entries):
+        exits = np.append(exits, len(held) - 1)
+    return entries, exits
+
+
+def simulate(z_scores, prices, dates=None, diff_values=None,
+             buy_threshold=BUY_THRESHOLD, sell_threshold=SELL_THRESHOLD,
+             warmup=WARMUP, initial_cash=INITIAL_CASH, held=None):
+    """
+    全仓进出的Z-score策略回测
+
+    held为持仓状态数组（例如signal_state由组合信号得到的结果）时按它交易，不再使用阈值；
+    z_scores仍用于流水中的z_score列。
+
+    返回交易流水字典，每一列都是按交易顺序排列的NumPy数组：
+    index/date/side(1买入,-1卖出)/price/diff/z_score/trade_profit(本次收益)/total_profit(总收益)，
+    另有逐日权益equity、最终收益final_profit和完整交易次数trade_count。
+    """
+    z_scores = np.asarray(z_scores, dtype=np.float64)
+    prices = np.asarray(prices, dtype=np.float64)
+    n = len(prices)
+
+    if held is None:
+        held = holding_state(z_scores, buy_threshold, sell_threshold, warmup)
+    entries, exits = trade_points(held)
+    buy_prices = prices[entries]
+    sell_prices = prices[exits]
+
+    # 每笔交易全仓买入，资金按卖出价/买入价复利
+    cash_levels = initial_cash * np.concatenate(([1.0], np.cumprod(sell_prices / buy_prices)))
+    shares = cash_levels[:-1] / buy_prices
+    trade_profit = (sell_prices - buy_prices) * shares
+
+    # 买卖交替排列成流水
+    m = len(entries)
+    rows = np.empty(2 * m, dtype=np.int64)
+    rows[0::2] = entries
+    rows[1::2] = exits
+    side = np.tile(np.array([1, -1], dtype=np.int8), m)
+    profits = np.zeros(2 * m)
+    profits[1::2] = trade_profit
+    totals = np.empty(2 * m)
+    totals[0::2] = cash_levels[:-1] - initial_cash
+    totals[1::2] = cash_levels[1:] - initial_cash
+
+    # 逐日权益：持仓期间为股数*收盘价，空仓期间为现金
+    bars = np.arange(n)
+    completed = np.searchsorted(exits, bars, side="right")
+    opened = np.searchsorted(entries, bars, side="right")
+    in_trade = opened > completed
+    equity = cash_levels[completed].copy()
+    if m:
+        open_idx = np.minimum(completed, m - 1)
+        equity[in_trade] = shares[open_idx[in_trade]] * prices[in_trade]
+
+    return {
+        "index": rows,
+        "date": np.asarray(dates)[rows] if dates is not None else rows,
+        "side": side,
+        "price": prices[rows],
+        "diff": np.asarray(diff_values, dtype=np.float64)[rows] if diff_values is not None else np.full(2 * m, np.nan),
+        "z_score": z_scores[rows],
+        "trade_profit": profits,
+        "total_profit": totals,
+        "equity": equity,
+        "final_profit": float(cash_levels[-1] - initial_cash),
+        "trade_count": m,
+    }
+
+
+def max_drawdown(equity):
+    """权益曲线的最大回撤（比例，0~1）"""
+    equity = np.asarray(equity, dtype=np.float64)
+    if len(equity) == 0:
+        return 0.0
+    peak = np.maximum.accumulate(equity)
+    return float(np.max(1.0 - equity / peak))
+
+
+def print_ledger(ledger):
+    """按控制台表格打印交易流水"""
+    print("="*80)
+    print(f"{'日期':<10} {'操作':<6} {'价格':<10} {'diff':<10} {'ZScore':<10} {'本次收益':<12} {'总收益':<12}")
+    print("-"*80)
+    for date, side, price, diff, z_score, trade_profit, total_profit in zip(
+            format_dates(ledger["date"]), ledger["side"], ledger["price"], ledger["diff"],
+            ledger["z_score"], ledger["trade_profit"], ledger["total_profit"]):
+        action = "买入" if side > 0 else "卖出"
+        print(f"{date}  {action}   {price:<10.2f} {diff:<10.4f} {z_score:<10.4f} {trade_profit:<12.2f} {total_profit:<12.2f}")
+    total_profit = ledger["total_profit"][-1] if len(ledger["total_profit"]) else 0.0
+    print("-"*80)
+    print(f"最终收益: {ledger['final_profit']:.2f} 元")
+    print(f"总收益: {total_profit:.2f} 元")
+    print("="*80)
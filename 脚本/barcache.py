@@ -0,0 +1,82 @@
+"""本地K线缓存：按 (接口, 代码, 周期, 复权) 把解析后的列存进内存映射的列式库，之后只增量请求缺失的日期"""
+import os
+import time
+
+import numpy as np
+
+import colstore
+import profiling
+from bars import parse_records, to_datetime64
+from mairui import build_url, fetch_json
+
+CACHE_DIR = os.environ.get("MAIRUI_CACHE_DIR", os.path.join(os.path.dirname(os.path.abspath(__file__)), "cache"))
+STORE_DIR = os.path.join(CACHE_DIR, "store")
+MAX_AGE = 600  # 缓存在这么多秒内更新过就不再请求API
+
+
+def cache_path(endpoint, code, period, adjust=None):
+    """缓存目录路径（period可以是d、w、m，也可以是分钟周期）"""
+    name = "_".join([endpoint.replace("/", "-"), code, period, adjust or "-"])
+    return os.path.join(STORE_DIR, name)
+
+
+def _date_key(t):
+    """把日期转成接口参数用的 20240102"""
+    return str(np.datetime64(t, "D")).replace("-", "")
+
+
+def _start(st):
+    return to_datetime64(st) if st else None
+
+
+def _end(et):
+    """et当天的数据也包含在内，返回右开区间的结束时间"""
+    return to_datetime64(et) + np.timedelta64(1, "D") if et else None
+
+
+def index():
+    """所有缓存序列的日期范围：{目录名: {"rows", "first", "last"}}"""
+    return colstore.index(STORE_DIR)
+
+
+def get_bars(endpoint, code, period, license, adjust=None, st=None, et=None, max_age=MAX_AGE):
+    """
+    获取K线/指标数据，返回 (列字典, 错误信息)
+
+    返回的各列是磁盘文件的内存映射切片，只读、不复制。
+    有缓存时只请求缓存最后一天到现在的数据（最后一天重新取一次，盘中数据可能变化）并追加到文件末尾；
+    请求的起始日期早于缓存覆盖的范围时重新全量获取。缓存已覆盖到et或在max_age秒内更新过时不发请求。
+    增量请求失败时返回已有的缓存数据。
+    """
+    path = cache_path(endpoint, code, period, adjust)
+    meta = colstore.read_meta(path)
+    if meta and meta.get("rows"):
+        covered_from = meta.get("covered_from", "")
+        if covered_from == "" or (st and st >= covered_from):
+            last = _date_key(meta["last"])
+            if (et and last >= et) or time.time() - meta.get("fetched_at", 0) < max_age:
+                return colstore.read(path, _start(st), _end(et), meta), None
+            data, error = fetch_json(build_url(endpoint, code, period, license, adjust, last, et))
+            if error:
+                return colstore.read(path, _start(st), _end(et), meta), None
+            with profiling.stage("parse", code) as timing:
+                columns = parse_records(data)
+                timing.rows = len(data)
+            meta = colstore.append(path, columns, fetched_at=time.time())
+            return colstore.read(path, _start(st), _end(et), meta), None
+
+    data, error = fetch_json(build_url(endpoint, code, period, license, adjust, st, et))
+    if error:
+        return None, error
+    if not data:
+        return None, "API返回数据格式错误"
+    with profiling.stage("parse", code) as timing:
+        columns = parse_records(data)
+        timing.rows = len(data)
+    if meta and meta.get("rows"):
+        # 保留缓存中比这次请求更新的部分
+        cached = colstore.read(path, columns["t"][-1] + np.timedelta64(1, "s"), meta=meta)
+        if cached:
+            columns = {name: np.concatenate((values, cached[name])) for name, values in columns.items() if name in cached}
+    meta = colstore.write(path, columns, fetched_at=time.time(), covered_from=st or "")
+    return colstore.read(path, _start(st), _end(et), meta), None
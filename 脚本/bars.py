@@ -0,0 +1,75 @@
+"""API返回数据的解析：把字典列表直接转换成按列存放的定长数组，并按日期做向量化截取"""
+from datetime import datetime
+from operator import itemgetter
+
+import numpy as np
+
+DATE_DTYPE = "datetime64[s]"  # 日期列按秒存放，底层为int64
+
+
+def parse_dates(values):
+    """把 2024-01-02 或 2024-01-02 15:00:00 格式的日期转换成datetime64[s]数组"""
+    values = np.asarray(values)
+    if values.dtype.kind == "M":
+        return values.astype(DATE_DTYPE)
+    return values.astype(str).astype(DATE_DTYPE)
+
+
+def parse_records(records):
+    """
+    把API返回的字典列表转换成 {字段: 数组}
+
+    t转换成datetime64[s]，数值字段（o/h/l/c/v/diff/dea/macd等）为float64，
+    其他无法转换成数字的字段保留为字符串数组。逐列用fromiter读取，不生成中间列表。
+    """
+    if not records:
+        return {}
+    n = len(records)
+    columns = {}
+    for field in records[0]:
+        getter = itemgetter(field)
+        if field == "t":
+            columns[field] = parse_dates([getter(item) for item in records])
+            continue
+        try:
+            columns[field] = np.fromiter(map(getter, records), dtype=np.float64, count=n)
+        except (TypeError, ValueError, KeyError):
+            columns[field] = np.array([item.get(field) for item in records], dtype=str)
+    return columns
+
+
+def to_datetime64(value):
+    """把datetime/date/字符串（YYYY-MM-DD或YYYYMMDD）转换成datetime64[s]"""
+    if isinstance(value, str) and len(value) == 8 and value.isdigit():
+        value = f"{value[:4]}-{value[4:6]}-{value[6:]}"
+    if isinstance(value, datetime):
+        value = value.replace(tzinfo=None)
+    return np.datetime64(value, "s")
+
+
+def date_range(columns, start=None, end=None):
+    """返回日期在 [start, end) 范围内的切片下标 (lo, hi)，用searchsorted在日期列上查找"""
+    dates = columns["t"]
+    lo = np.searchsorted(dates, to_datetime64(start), side="left") if start is not None else 0
+    hi = np.searchsorted(dates, to_datetime64(end), side="left") if end is not None else len(dates)
+    return lo, hi
+
+
+def select(columns, start=None, end=None):
+    """截取日期在 [start, end) 范围内的数据（切片视图，不复制）"""
+    if not columns:
+        return columns
+    lo, hi = date_range(columns, start, end)
+    return {name: values[lo:hi] for name, values in columns.items()}
+
+
+def format_dates(dates):
+    """把日期列格式化成字符串数组；全部是零点时只保留日期部分"""
+    dates = np.asarray(dates)
+    if len(dates) == 0:
+        return np.array([], dtype=str)
+    if dates.dtype.kind != "M":
+        return dates.astype(str)
+    seconds = dates.astype(DATE_DTYPE).astype(np.int64)
+    unit = "D" if np.all(seconds % 86400 == 0) else "s"
+    return np.char.replace(np.datetime_as_string(dates, unit=unit), "T", " ")
@@ -0,0 +1,186 @@
+"""
+基准测试：用合成数据分别计时各处理阶段，结果写入JSON文件，便于比较不同版本的快慢
+
+按K线数量（单支股票1千到100万根）计时：
+    parse     API返回的JSON解码并转换成列数组
+    filter    按日期截取过去一年（macd.py的过滤）
+    stats     窗口内均值、标准差、Z-score（macd.py的统计）和逐日Z-score表（TrailingZScore）
+    indicator 由收盘价计算MACD
+    simulate  逐日Z-score加交易模拟（mockTrack.py的回测）
+    render    打印交易流水
+按股票数量（1到5000支）计时：
+    fetch     通过本地替身服务并发请求（不限速）
+    align     对齐成 日期×股票 矩阵
+    screen    全部股票的Z-score和排名
+    render    打印选股结果
+
+用法：
+    python bench.py                         全部规模，结果写入 bench-<日期>.json
+    python bench.py --bars 1000 10000 --codes 1 100 --output new.json
+    python bench.py --compare old.json      与之前的结果对比
+"""
+import argparse
+import contextlib
+import io
+import json
+import os
+import platform
+import statistics
+import subprocess
+import time
+from datetime import datetime
+
+import numpy as np
+
+import mairui
+import mockapi
+from backtest import print_ledger, simulate
+from bars import parse_records, select
+from indicators import macd
+from rolling import TrailingZScore, zscore_series
+from screener import align, print_screen, screen
+
+BAR_SIZES = (1000, 10000, 100000, 1000000)
+CODE_SIZES = (1, 10, 100, 1000, 5000)
+BARS_PER_CODE = 500    # 按股票数量计时时每支股票的K线数
+REPEAT = 5             # 每项最多重复次数
+BUDGET = 2.0           # 每项累计超过这么多秒后不再重复
+
+
+def measure(func, repeat=REPEAT, budget=BUDGET):
+    """重复调用func计时，返回 {"runs", "min", "median", "mean"}（秒）"""
+    times = []
+    while len(times) < repeat and sum(times) < budget:
+        start = time.perf_counter()
+        func()
+        times.append(time.perf_counter() - start)
+    return {"runs": len(times), "min": min(times), "median": statistics.median(times), "mean": statistics.fmean(times)}
+
+
+def _quiet(func, *args):
+    """调用打印函数，输出写到内存中丢弃"""
+    with contextlib.redirect_stdout(io.StringIO()):
+        func(*args)
+
+
+def bench_bars(n, repeat=REPEAT):
+    """单支股票n根K线的各阶段耗时，返回 {阶段: 计时结果}"""
+    columns = mockapi.synthetic_bars("000001", "d", n)
+    payload = json.dumps(mockapi.synthetic_records("hszbl/macd", "000001", "d", n)).encode("utf-8")
+    bars = parse_records(json.loads(payload))
+    one_year_ago = bars["t"][-1] - np.timedelta64(365, "D")
+    close, diff = columns["c"], columns["diff"]
+
+    def stats():
+        window = select(bars, one_year_ago)["diff"]
+        mean, std = np.mean(window), np.std(window)
+        return (window[-1] - mean) / std, TrailingZScore(bars["t"], bars["diff"])
+
+    z_scores, _, _ = zscore_series(diff, exclude_current=True)
+    ledger = simulate(z_scores, close, columns["t"], diff)
+    return {
+        "parse": measure(lambda: parse_records(json.loads(payload)), repeat),
+        "filter": measure(lambda: select(bars, one_year_ago), repeat),
+        "stats": measure(stats, repeat),
+        "indicator": measure(lambda: macd(close), repeat),
+        "simulate": measure(lambda: simulate(zscore_series(diff, exclude_current=True)[0], close, columns["t"], diff), repeat),
+        "render": measure(lambda: _quiet(print_ledger, ledger), repeat),
+    }, {"payload_bytes": len(payload), "trades": int(ledger["trade_count"])}
+
+
+def bench_codes(n, server, repeat=REPEAT):
+    """n支股票（每支BARS_PER_CODE根K线）的各阶段耗时"""
+    stocks = [{"code": f"{i:06d}", "name": f"合成{i}"} for i in range(n)]
+    histories = [mockapi.synthetic_bars(stock["code"], "d", BARS_PER_CODE) for stock in stocks]
+    dates, matrix = align(histories)
+    result = screen(dates, matrix)
+    urls = [f"{server.base_url}/hszbl/macd/{stock['code']}/d/BENCH" for stock in stocks]
+
+    def fetch():
+        for data, error in mairui.map_concurrent(mairui.fetch_json, urls):
+            if error:
+                raise RuntimeError(error)
+
+    fetch()  # 预热替身服务端的合成数据缓存，只计客户端和传输的时间
+    return {
+        "fetch": measure(fetch, repeat),
+        "align": measure(lambda: align(histories), repeat),
+        "screen": measure(lambda: screen(dates, matrix), repeat),
+        "render": measure(lambda: _quiet(print_screen, stocks, result), repeat),
+    }, {"bars_per_code": BARS_PER_CODE}
+
+
+def _git_commit():
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True,
+                              cwd=os.path.dirname(os.path.abspath(__file__))).stdout.strip() or None
+    except OSError:
+        return None
+
+
+def run(bar_sizes=BAR_SIZES, code_sizes=CODE_SIZES, repeat=REPEAT, log=print):
+    """执行全部基准测试，返回可写入JSON的结果字典"""
+    results = []
+    for n in bar_sizes:
+        stages, extra = bench_bars(n, repeat)
+        for stage, timing in stages.items():
+            results.append({"axis": "bars", "size": n, "stage": stage, **timing, **extra})
+            log(f"bars={n:<8} {stage:<10} {timing['min'] * 1e3:10.3f} ms")
+
+    server = mockapi.start(bars=BARS_PER_CODE)
+    rate_limit, mairui.RATE_LIMIT = mairui.RATE_LIMIT, 0  # 本地服务不需要限速
+    try:
+        for n in code_sizes:
+            stages, extra = bench_codes(n, server, repeat)
+            for stage, timing in stages.items():
+                results.append({"axis": "codes", "size": n, "stage": stage, **timing, **extra})
+                log(f"codes={n:<7} {stage:<10} {timing['min'] * 1e3:10.3f} ms")
+    finally:
+        mairui.RATE_LIMIT = rate_limit
+        server.shutdown()
+        server.server_close()
+
+    return {
+        "time": datetime.now().isoformat(timespec="seconds"),
+        "commit": _git_commit(),
+        "python": platform.python_version(),
+        "numpy": np.__version__,
+        "machine": platform.platform(),
+        "results": results,
+    }
+
+
+def compare(old, new):
+    """按 (维度, 规模, 阶段) 对比两次结果的最短耗时，打印倍数（大于1表示变慢）"""
+    previous = {(row["axis"], row["size"], row["stage"]): row["min"] for row in old["results"]}
+    print(f"对比 {old.get('commit')} ({old.get('time')}) -> {new.get('commit')} ({new.get('time')})")
+    print(f"{'维度':<6} {'规模':>8} {'阶段':<10} {'之前(ms)':>12} {'现在(ms)':>12} {'倍数':>8}")
+    for row in new["results"]:
+        before = previous.get((row["axis"], row["size"], row["stage"]))
+        if before is None:
+            continue
+        print(f"{row['axis']:<8} {row['size']:>8} {row['stage']:<10} {before * 1e3:>14.3f} "
+              f"{row['min'] * 1e3:>14.3f} {row['min'] / before:>10.2f}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="各处理阶段的基准测试")
+    parser.add_argument("--bars", type=int, nargs="*", default=BAR_SIZES, help="单支股票的K线数量")
+    parser.add_argument("--codes", type=int, nargs="*", default=CODE_SIZES, help="股票数量")
+    parser.add_argument("--repeat", type=int, default=REPEAT, help="每项最多重复次数")
+    parser.add_argument("--output", default=None, help="结果JSON文件，默认 bench-<日期时间>.json")
+    parser.add_argument("--compare", metavar="FILE", default=None, help="与之前的结果文件对比")
+    args = parser.parse_args()
+
+    report = run(args.bars, args.codes, args.repeat)
+    output = args.output or f"bench-{datetime.now().strftime('%Y%m%d-%H%M%S')}.json"
+    with open(output, "w", encoding="utf-8") as f:
+        json.dump(report, f, ensure_ascii=False, indent=1)
+    print(f"结果已写入 {output}")
+    if args.compare:
+        with open(args.compare, encoding="utf-8") as f:
+            compare(json.load(f), report)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,216 @@
+"""
+DIF走势图：在Tk画布上绘制DIF、均值±标准差（推荐买入值/卖出值）和Z-score
+
+绘制前按像素宽度对可见区间做最小/最大值分桶抽样，每个像素列只保留区间内的最低点和最高点，
+折线的形状和极值与全量绘制一致，点数与数据长度无关；缩放和平移只更新已有折线的坐标。
+滚轮缩放（以鼠标位置为中心），左键拖动平移，双击恢复全部。
+"""
+import tkinter as tk
+
+import numpy as np
+
+from bars import format_dates
+
+MIN_VISIBLE = 20       # 最多放大到可见的数据点数
+ZOOM_STEP = 1.25
+Z_PANEL = 0.3          # Z-score子图占画布高度的比例
+MARGIN = (50, 10, 10, 20)  # 左、上、右、下边距（像素）
+SERIES = {"diff": "values", "mean": "mean", "buy": "buy", "sell": "sell", "z_score": "z_score"}  # 折线名 -> 表的属性
+COLORS = {"diff": "#1f77b4", "buy": "#2ca02c", "sell": "#d62728", "mean": "#999999", "z_score": "#9467bd"}
+
+
+def minmax_indices(values, start, stop, buckets):
+    """
+    把 [start, stop) 分成不超过buckets个等长的桶，返回每桶最小值和最大值的下标（升序）
+
+    点数不超过2*buckets时原样返回全部下标；NaN不参与比较（整桶都是NaN时取桶内第一个点，绘制时断开）。
+    """
+    start, stop = max(int(start), 0), min(int(stop), len(values))
+    n = stop - start
+    if n <= 2 * buckets:
+        return np.arange(start, stop)
+    size = -(-n // buckets)
+    count = -(-n // size)
+    segment = np.asarray(values[start:stop], dtype=np.float64)
+    missing = np.isnan(segment)
+    pad = count * size - n
+    low = np.concatenate([np.where(missing, np.inf, segment), np.full(pad, np.inf)]).reshape(count, size)
+    high = np.concatenate([np.where(missing, -np.inf, segment), np.full(pad, -np.inf)]).reshape(count, size)
+    offsets = np.arange(count) * size
+    pairs = np.stack([offsets + np.argmin(low, axis=1), offsets + np.argmax(high, axis=1)], axis=1)
+    return np.minimum(np.sort(pairs, axis=1).ravel(), n - 1) + start
+
+
+def segments(xs, ys):
+    """按NaN把折线切成若干段，返回 [[x0, y0, x1, y1, ...], ...]，少于两个点的段丢弃"""
+    valid = ~(np.isnan(xs) | np.isnan(ys))
+    if not valid.any():
+        return []
+    edges = np.flatnonzero(np.diff(np.concatenate([[False], valid, [False]]).astype(np.int8)))
+    result = []
+    for begin, end in zip(edges[0::2], edges[1::2]):
+        if end - begin >= 2:
+            result.append(np.column_stack([xs[begin:end], ys[begin:end]]).ravel().tolist())
+    return result
+
+
+class DifChart(tk.Canvas):
+    """
+    DIF走势图控件：show()设置一张TrailingZScore表，mark()标出分析日期
+
+    上方为DIF和均值±标准差，下方为Z-score和±1参考线；视图用浮点下标区间 [lo, hi) 表示。
+    """
+
+    def __init__(self, master, **options):
+        options.setdefault("background", "white")
+        options.setdefault("highlightthickness", 0)
+        super().__init__(master, **options)
+        self.table = None
+        self.lo, self.hi = 0.0, 1.0
+        self.marker = None
+        self.items = {}          # 折线名 -> 画布对象id列表，重绘时复用
+        self.pending = False
+        self.drag = None
+        self.bind("<Configure>", lambda event: self.schedule())
+        self.bind("<MouseWheel>", lambda event: self.zoom(event.x, event.delta > 0))
+        self.bind("<Button-4>", lambda event: self.zoom(event.x, True))
+        self.bind("<Button-5>", lambda event: self.zoom(event.x, False))
+        self.bind("<ButtonPress-1>", self.on_press)
+        self.bind("<B1-Motion>", self.on_drag)
+        self.bind("<Double-Button-1>", lambda event: self.reset())
+
+    def show(self, table, marker=None):
+        """换一张表时显示全部数据，同一张表只更新标记"""
+        if table is not self.table:
+            self.table = table
+            self.delete("all")
+            self.items = {}
+            self.lo, self.hi = 0.0, float(max(len(table.dates), 1))
+        self.mark(marker)
+
+    def mark(self, index):
+        self.marker = index
+        self.schedule()
+
+    def reset(self):
+        if self.table is not None:
+            self.lo, self.hi = 0.0, float(max(len(self.table.dates), 1))
+            self.schedule()
+
+    def schedule(self):
+        """合并同一轮事件中的多次重绘请求"""
+        if not self.pending:
+            self.pending = True
+            self.after_idle(self.redraw)
+
+    def _plot_area(self):
+        left, top, right, bottom = MARGIN
+        width = max(self.winfo_width() - left - right, 1)
+        height = max(self.winfo_height() - top - bottom, 1)
+        return left, top, width, height
+
+    def _index_at(self, x):
+        left, _, width, _ = self._plot_area()
+        return self.lo + (x - left) / width * (self.hi - self.lo)
+
+    def _clamp(self, lo, hi):
+        n = len(self.table.dates)
+        span = min(max(hi - lo, MIN_VISIBLE), max(n, 1))
+        lo = min(max(lo, 0.0), n - span)
+        return lo, lo + span
+
+    def zoom(self, x, zoom_in):
+        if self.table is None or len(self.table.dates) == 0:
+            return
+        center = self._index_at(x)
+        scale = 1 / ZOOM_STEP if zoom_in else ZOOM_STEP
+        self.lo, self.hi = self._clamp(center - (center - self.lo) * scale, center + (self.hi - center) * scale)
+        self.schedule()
+
+    def on_press(self, event):
+        self.drag = (event.x, self.lo, self.hi)
+
+    def on_drag(self, event):
+        if self.table is None or self.drag is None or len(self.table.dates) == 0:
+            return
+        x, lo, hi = self.drag
+        _, _, width, _ = self._plot_area()
+        shift = (x - event.x) / width * (hi - lo)
+        self.lo, self.hi = self._clamp(lo + shift, hi + shift)
+        self.schedule()
+
+    def _polyline(self, name, lines, **options):
+        """把折线name更新为给定的若干段：已有对象只改坐标，多出的删除，不足的新建"""
+        items = self.items.setdefault(name, [])
+        for item, coords in zip(items, lines):
+            self.coords(item, coords)
+        for item in items[len(lines):]:
+            self.delete(item)
+        for coords in lines[len(items):]:
+            items.append(self.create_line(coords, **options))
+        del items[len(lines):]
+
+    def _text(self, name, x, y, text, **options):
+        items = self.items.setdefault(name, [])
+        if items:
+            self.coords(items[0], x, y)
+            self.itemconfigure(items[0], text=text)
+        else:
+            items.append(self.create_text(x, y, text=text, font=("Arial", 8), **options))
+
+    def redraw(self):
+        self.pending = False
+        if self.table is None or len(self.table.dates) == 0:
+            return
+        table = self.table
+        left, top, width, height = self._plot_area()
+        upper = height * (1 - Z_PANEL)
+        lower_top = top + upper + 10
+        lower = max(height - upper - 10, 1)
+        start, stop = int(np.floor(self.lo)), int(np.ceil(self.hi)) + 1
+        span = self.hi - self.lo
+
+        def xs(index):
+            return left + (index - self.lo) / span * width
+
+        def scale(values, low, high, y0, h):
+            if not high > low:
+                low, high = low - 1, high + 1
+            return y0 + (high - values) / (high - low) * h
+
+        # 各序列各自抽样，y轴范围取抽样后可见点的范围（抽样保留了极值，与全量范围相同）
+        series = {name: getattr(table, SERIES[name]) for name in SERIES}
+        sampled = {name: minmax_indices(values, start, stop, width) for name, values in series.items()}
+        values = {name: series[name][index] for name, index in sampled.items()}
+        top_values = np.concatenate([values[name] for name in ("diff", "buy", "sell")])
+        low, high = (np.nanmin(top_values), np.nanmax(top_values)) if np.isfinite(top_values).any() else (0.0, 0.0)
+        z_values = values["z_score"][np.isfinite(values["z_score"])]
+        z_limit = max(float(np.max(np.abs(z_values))) if len(z_values) else 0.0, 1.5)
+
+        for name in ("mean", "buy", "sell", "diff"):
+            ys = scale(values[name], low, high, top, upper)
+            self._polyline(name, segments(xs(sampled[name]), ys), fill=COLORS[name],
+                           width=2 if name == "diff" else 1, dash=(4, 2) if name != "diff" else ())
+        for name, level in (("z_zero", 0.0), ("z_buy", 1.0), ("z_sell", -1.0)):
+            y = float(scale(np.array(level), -z_limit, z_limit, lower_top, lower))
+            self._polyline(name, [[left, y, left + width, y]], fill="#cccccc", dash=(2, 2))
+        ys = scale(values["z_score"], -z_limit, z_limit, lower_top, lower)
+        self._polyline("z_score", segments(xs(sampled["z_score"]), ys), fill=COLORS["z_score"])
+        self._polyline("frame", [[left, top, left, top + height, left + width, top + height]], fill="#666666")
+
+        if self.marker is not None and start <= self.marker < stop:
+            x = float(xs(self.marker))
+            self._polyline("marker", [[x, top, x, top + height]], fill="#ff7f0e")
+        else:
+            self._polyline("marker", [])
+
+        first, last = max(start, 0), min(stop, len(table.dates)) - 1
+        labels = format_dates(table.dates[[first, last]])
+        self._text("date_lo", left, top + height + 2, labels[0], anchor=tk.NW)
+        self._text("date_hi", left + width, top + height + 2, labels[1], anchor=tk.NE)
+        self._text("y_hi", left - 4, top, f"{high:.3f}", anchor=tk.NE)
+        self._text("y_lo", left - 4, top + upper, f"{low:.3f}", anchor=tk.E)
+        self._text("z_hi", left - 4, lower_top, f"z {z_limit:.1f}", anchor=tk.NE)
+        self._text("z_lo", left - 4, lower_top + lower, f"z {-z_limit:.1f}", anchor=tk.E)
+        for item in self.items["marker"]:
+            self.tag_raise(item)
@@ -0,0 +1,54 @@
+"""分析服务（service.py）的客户端：设置环境变量 MAIRUI_SERVICE 后各脚本改为向服务请求结果"""
+import os
+
+import numpy as np
+import requests
+
+SERVICE_URL = os.environ.get("MAIRUI_SERVICE", "").rstrip("/")
+TIMEOUT = 60
+
+_session = requests.Session()
+
+
+def call(path, **params):
+    """请求服务的一个接口，返回 (数据, 错误信息)"""
+    params = {name: value for name, value in params.items() if value is not None}
+    try:
+        response = _session.get(f"{SERVICE_URL}{path}", params=params, timeout=TIMEOUT)
+        data = response.json()
+    except (requests.exceptions.RequestException, ValueError) as e:
+        return None, f"分析服务请求失败: {str(e)}"
+    if isinstance(data, dict) and "error" in data:
+        return None, data["error"]
+    return data, None
+
+
+def zscore(stock, endpoint, license, days):
+    """与macd.analyze_stock格式相同的 (结果, 错误信息)"""
+    data, error = call("/zscore", code=stock["code"], endpoint=endpoint, license=license, days=days)
+    if error:
+        return None, error
+    return {**data, "code": stock["code"], "name": stock["name"]}, None
+
+
+def series(code, endpoint, license, adjust=None):
+    """与get_bars格式相同的 {"t", "diff"} 列字典"""
+    data, error = call("/series", code=code, endpoint=endpoint, license=license, adjust=adjust)
+    if error:
+        return None, error
+    return {"t": np.array(data["t"], dtype=np.int64).astype("datetime64[s]"),
+            "diff": np.array(data["diff"], dtype=np.float64)}, None
+
+
+def backtest(code, market, license, **params):
+    """返回与backtest.simulate相同列名的交易流水（不含逐日权益）"""
+    data, error = call("/backtest", code=code, market=market, license=license, **params)
+    if error:
+        return None, error
+    # 服务端把NaN写成null，数值列按float64读回NaN
+    ledger = {field: np.array(values) if field in ("date", "side") else np.array(values, dtype=np.float64)
+              for field, values in data["ledger"].items()}
+    ledger["final_profit"] = data["final_profit"]
+    ledger["trade_count"] = data["trade_count"]
+    ledger["max_drawdown"] = data["max_drawdown"]
+    return ledger, None
@@ -0,0 +1,129 @@
+"""按列存放的K线库：每条序列一个目录，每列一个原始二进制文件，读取时内存映射
+
+目录结构（由barcache按 (接口, 代码, 周期, 复权) 命名目录）：
+    <序列目录>/meta.json   行数、各列dtype、起止日期、更新时间等
+    <序列目录>/<列名>.bin  该列的原始数组（t为datetime64[s]，数值列为float64）
+
+追加新数据只在文件末尾写入（覆盖与已有数据重叠的几行），不重写整个文件，也从不截断文件，
+真实行数以meta.json为准，因此先写数据后写meta，中途中断不会留下不一致的数据。
+"""
+import json
+import os
+import threading
+
+import numpy as np
+
+_locks = {}
+_locks_guard = threading.Lock()
+
+
+def _lock(path):
+    with _locks_guard:
+        return _locks.setdefault(path, threading.Lock())
+
+
+def read_meta(path):
+    """读取meta.json，不存在或损坏时返回None"""
+    try:
+        with open(os.path.join(path, "meta.json"), encoding="utf-8") as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+
+def _write_meta(path, meta):
+    tmp_path = os.path.join(path, "meta.json.tmp")
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        json.dump(meta, f, ensure_ascii=False)
+    os.replace(tmp_path, os.path.join(path, "meta.json"))
+
+
+def _write_column(path, name, values, offset_rows):
+    """从第offset_rows行开始写入一列"""
+    file_path = os.path.join(path, name + ".bin")
+    mode = "r+b" if os.path.exists(file_path) else "wb"
+    with open(file_path, mode) as f:
+        f.seek(offset_rows * values.dtype.itemsize)
+        f.write(np.ascontiguousarray(values).tobytes())
+
+
+def _store(path, columns, keep_rows, meta_extra):
+    """保留前keep_rows行，把columns写在其后并更新meta"""
+    os.makedirs(path, exist_ok=True)
+    meta = read_meta(path) or {}
+    fields = {name: values.dtype.str for name, values in columns.items()}
+    if keep_rows and meta.get("fields"):
+        # 只保留两边都有且类型一致的列
+        fields = {name: dtype for name, dtype in fields.items() if meta["fields"].get(name) == dtype}
+    for name in fields:
+        _write_column(path, name, columns[name], keep_rows)
+    rows = keep_rows + len(columns["t"])
+    meta.update(meta_extra)
+    meta.update({
+        "rows": rows,
+        "fields": fields,
+        "first": str(_read_column(path, "t", fields["t"], rows)[0]) if rows else None,
+        "last": str(columns["t"][-1]) if len(columns["t"]) else meta.get("last"),
+    })
+    _write_meta(path, meta)
+    return meta
+
+
+def _read_column(path, name, dtype, rows):
+    """内存映射一列的前rows行"""
+    if rows == 0:
+        return np.empty(0, dtype=dtype)
+    return np.memmap(os.path.join(path, name + ".bin"), dtype=dtype, mode="r", shape=(rows,))
+
+
+def write(path, columns, **meta_extra):
+    """整体写入一条序列（替换原有数据）"""
+    with _lock(path):
+        return _store(path, columns, 0, meta_extra)
+
+
+def append(path, columns, **meta_extra):
+    """
+    追加数据：日期不早于已有最后几行的数据会覆盖这些行（盘中最后一根K线会变化），其余追加在末尾
+    """
+    with _lock(path):
+        meta = read_meta(path)
+        if not meta or not meta.get("rows"):
+            return _store(path, columns, 0, meta_extra)
+        if not len(columns.get("t", [])):
+            meta.update(meta_extra)
+            _write_meta(path, meta)
+            return meta
+        dates = _read_column(path, "t", meta["fields"]["t"], meta["rows"])
+        keep = int(np.searchsorted(dates, columns["t"][0], side="left"))
+        del dates
+        return _store(path, columns, keep, meta_extra)
+
+
+def read(path, start=None, end=None, meta=None):
+    """
+    以内存映射方式读取 [start, end) 日期范围内的数据，返回 {列名: 数组视图}
+
+    只有真正访问到的页面才会从磁盘读入，不复制整条历史。序列不存在时返回 {}。
+    """
+    meta = meta or read_meta(path)
+    if not meta or not meta.get("rows"):
+        return {}
+    rows = meta["rows"]
+    columns = {name: _read_column(path, name, dtype, rows) for name, dtype in meta["fields"].items()}
+    dates = columns["t"]
+    lo = int(np.searchsorted(dates, np.datetime64(start, "s"), side="left")) if start is not None else 0
+    hi = int(np.searchsorted(dates, np.datetime64(end, "s"), side="left")) if end is not None else rows
+    return {name: values[lo:hi] for name, values in columns.items()}
+
+
+def index(root):
+    """root下所有序列的日期范围索引：{目录名: {"rows", "first", "last"}}"""
+    result = {}
+    if not os.path.isdir(root):
+        return result
+    for name in sorted(os.listdir(root)):
+        meta = read_meta(os.path.join(root, name))
+        if meta:
+            result[name] = {"rows": meta.get("rows", 0), "first": meta.get("first"), "last": meta.get("last")}
+    return result
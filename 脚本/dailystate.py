@@ -0,0 +1,129 @@
+"""盘中/每日增量更新：为每支股票保存窗口内的DIF和累加和，新数据到来时O(1)滚动窗口"""
+import os
+from collections import deque
+from datetime import datetime, timedelta
+
+import numpy as np
+
+from barcache import CACHE_DIR, get_bars
+from bars import parse_records, select, to_datetime64
+from mairui import build_url, fetch_json
+
+STATE_DIR = os.path.join(CACHE_DIR, "state")
+
+
+class WindowState:
+    """
+    滚动窗口的状态：窗口内的 (日期, DIF) 以及偏移后的一阶、二阶累加和
+
+    最后一根K线在盘中会变化，再次收到同一天的数据时替换而不是追加。
+    偏移量取窗口内第一个值，每次创建（包括从文件读取）时重新计算累加和，不沿用旧的偏移。
+    """
+
+    def __init__(self, dates=(), values=()):
+        self.window = deque(zip(np.asarray(dates, dtype="datetime64[s]").tolist(),
+                                np.asarray(values, dtype=np.float64).tolist()))
+        self.shift = float(self.window[0][1]) if self.window else 0.0
+        self.sum1 = sum(value - self.shift for _, value in self.window)
+        self.sum2 = sum((value - self.shift) ** 2 for _, value in self.window)
+
+    @property
+    def last_date(self):
+        return np.datetime64(self.window[-1][0], "s") if self.window else None
+
+    def push(self, date, value):
+        """加入一根K线；与最后一根同一天时替换"""
+        if self.window and date <= self.window[-1][0]:
+            if date < self.window[-1][0]:
+                return
+            _, old = self.window.pop()
+            self.sum1 -= old - self.shift
+            self.sum2 -= (old - self.shift) ** 2
+        if not self.window:
+            self.shift, self.sum1, self.sum2 = float(value), 0.0, 0.0
+        self.window.append((date, value))
+        self.sum1 += value - self.shift
+        self.sum2 += (value - self.shift) ** 2
+
+    def expire(self, start):
+        """移除start之前的数据"""
+        while self.window and self.window[0][0] < start:
+            _, old = self.window.popleft()
+            self.sum1 -= old - self.shift
+            self.sum2 -= (old - self.shift) ** 2
+
+    def stats(self):
+        """返回 (数据点数, 均值, 标准差, 当前DIF)"""
+        count = len(self.window)
+        if count == 0:
+            return 0, float("nan"), float("nan"), float("nan")
+        mean_c = self.sum1 / count
+        std = max(self.sum2 / count - mean_c * mean_c, 0.0) ** 0.5
+        return count, mean_c + self.shift, std, self.window[-1][1]
+
+
+def state_path(name, code):
+    return os.path.join(STATE_DIR, f"{name}_{code}.npz")
+
+
+def load_state(name, code):
+    """读取保存的窗口数据并重建状态，没有时返回None"""
+    path = state_path(name, code)
+    if not os.path.exists(path):
+        return None
+    try:
+        with np.load(path) as npz:
+            return WindowState(npz["t"], npz["diff"])
+    except (OSError, ValueError, KeyError):
+        return None
+
+
+def save_state(name, code, state):
+    os.makedirs(STATE_DIR, exist_ok=True)
+    path = state_path(name, code)
+    dates = np.array([date for date, _ in state.window], dtype="datetime64[s]")
+    values = np.array([value for _, value in state.window], dtype=np.float64)
+    with open(path + ".tmp", "wb") as f:
+        np.savez(f, t=dates, diff=values)
+    os.replace(path + ".tmp", path)
+
+
+def update_stock(stock, name, endpoint, license, days):
+    """
+    增量更新一支股票并返回与analyze_stock相同格式的 (结果, 错误信息)
+
+    首次运行时用完整历史（优先本地缓存）初始化窗口，之后只请求上次最后一天及以后的数据。
+    """
+    window_start = to_datetime64(datetime.now() - timedelta(days=days))
+    state = load_state(name, stock["code"])
+    if state is None or state.last_date is None:
+        bars, error = get_bars(endpoint, stock["code"], "d", license)
+        if error:
+            return None, error
+        bars = select(bars, window_start)
+        state = WindowState(bars["t"], bars["diff"])
+    else:
+        last = str(state.last_date.astype("datetime64[D]")).replace("-", "")
+        data, error = fetch_json(build_url(endpoint, stock["code"], "d", license, st=last))
+        if error:
+            return None, error
+        bars = parse_records(data)
+        if bars and len(bars["t"]):
+            for date, value in zip(bars["t"].tolist(), bars["diff"].tolist()):
+                state.push(date, value)
+    state.expire(window_start.tolist())
+    save_state(name, stock["code"], state)
+
+    count, mean_diff, std_diff, current_diff = state.stats()
+    if count < 2:
+        return None, f"数据不足（需要至少2个数据点，当前有{count}个）"
+    if not std_diff > 0:
+        return None, "标准差为0（窗口内DIF没有变化），无法计算Z-score"
+    return {
+        "code": stock["code"],
+        "name": stock["name"],
+        "current_diff": current_diff,
+        "z_score": (current_diff - mean_diff) / std_diff,
+        "buy_diff": mean_diff + std_diff,
+        "sell_diff": mean_diff - std_diff
+    }, None
@@ -0,0 +1,103 @@
+"""本地计算技术指标：EMA / MACD(DIF、DEA、MACD柱)，不再依赖API的macd接口"""
+import sys
+
+import numpy as np
+
+FAST = 12
+SLOW = 26
+SIGNAL = 9
+_MAX_GROWTH = 1e3  # 分块内权重的最大放大倍数，控制舍入误差
+
+
+def ema(values, span):
+    """
+    指数移动平均，首个值为初值：y[0]=x[0]，y[i]=a*x[i]+(1-a)*y[i-1]，a=2/(span+1)
+
+    把序列切成若干块，块内用闭式解（带权重的cumsum）一次算完，
+    块与块之间只传递一个标量，避免逐个数据点的Python循环。
+    values也可以是 日期×股票 的二维矩阵，此时沿日期方向逐列计算。
+    """
+    values = np.asarray(values, dtype=np.float64)
+    n = len(values)
+    if n == 0:
+        return values.copy()
+    alpha = 2.0 / (span + 1)
+    decay = 1.0 - alpha
+    block = max(1, min(n, int(np.log(_MAX_GROWTH) / -np.log(decay)))) if decay > 0 else 1
+
+    rest = values.shape[1:]
+    pad = (-n) % block
+    x = np.concatenate((values, np.zeros((pad,) + rest))).reshape((-1, block) + rest)
+    j = np.arange(block).reshape((block,) + (1,) * len(rest))
+    down = decay ** j
+    # 块内从0开始的EMA：z[j] = sum(a*x[m]*decay^(j-m))
+    local = np.cumsum(alpha * x / down, axis=1) * down
+
+    # 块末值的递推 c[k] = local[k,-1] + decay^block * c[k-1]，初值为x[0]
+    block_decay = decay ** block
+    carries = np.empty((len(local),) + rest)
+    carry = values[0]
+    for k, last in enumerate(local[:, -1].tolist()):
+        carries[k] = carry
+        carry = last + block_decay * carry
+
+    out = local + carries[:, None] * decay ** (j + 1)
+    return out.reshape((-1,) + rest)[:n]
+
+
+def macd(close, fast=FAST, slow=SLOW, signal=SIGNAL):
+    """
+    由收盘价计算MACD，返回字典：
+    ema_fast/ema_slow、diff(DIF=快线-慢线)、dea(DIF的signal日EMA)、macd(2*(DIF-DEA))
+    """
+    close = np.asarray(close, dtype=np.float64)
+    ema_fast = ema(close, fast)
+    ema_slow = ema(close, slow)
+    diff = ema_fast - ema_slow
+    dea = ema(diff, signal)
+    return {
+        "ema_fast": ema_fast,
+        "ema_slow": ema_slow,
+        "diff": diff,
+        "dea": dea,
+        "macd": 2.0 * (diff - dea),
+    }
+
+
+def compare_diff(local_diff, api_diff, burn_in=120):
+    """
+    比较本地DIF和API返回的diff，返回跳过前burn_in个点后的最大绝对误差
+
+    API从上市首日开始计算EMA，本地只从请求的起始日期开始，前面一段数据会有差别，
+    随EMA收敛逐渐消失，所以比较时跳过开头部分。
+    """
+    local_diff = np.asarray(local_diff, dtype=np.float64)
+    api_diff = np.asarray(api_diff, dtype=np.float64)
+    if len(local_diff) != len(api_diff):
+        raise ValueError(f"长度不一致，{len(local_diff)} {len(api_diff)}")
+    if len(local_diff) <= burn_in:
+        return float("nan")
+    return float(np.max(np.abs(local_diff[burn_in:] - api_diff[burn_in:])))
+
+
+def main():
+    """用API的diff校验本地计算结果：python indicators.py 600036 000858"""
+    from barcache import get_bars
+    from mockTrack import LICENSE
+
+    for code in sys.argv[1:]:
+        stock, error = get_bars("hsstock/history", code, "d", LICENSE, "n", st="20200101")
+        if not error:
+            api_macd, error = get_bars("hsstock/history/macd", code, "d", LICENSE, "n", st="20200101")
+        if error:
+            print(f"{code} {error}")
+            continue
+        # 按日期对齐两个接口的数据
+        _, stock_idx, macd_idx = np.intersect1d(stock["t"], api_macd["t"], return_indices=True)
+        local = macd(stock["c"])
+        error = compare_diff(local["diff"][stock_idx], api_macd["diff"][macd_idx])
+        print(f"{code} 数据点数: {len(stock_idx)} DIF最大误差: {error:.6f}")
+
+
+if __name__ == "__main__":
+    main()
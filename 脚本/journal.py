@@ -0,0 +1,259 @@
+"""
+选股操作记录对账：读取 选股操作记录.xlsx 中的交易，按代码分组，与本地缓存的K线和DIF按日期对齐，
+给出每笔交易当天的信号Z-score、相对收盘价的滑点，以及实际收益与Z-score策略同期收益的对比
+
+    python journal.py                                  读取仓库根目录的 选股操作记录.xlsx
+    python journal.py 记录.xlsx --date 2025-10-17 --output 对账.csv
+
+工作簿每个工作表的第一行为表头，按列名识别：代码、名称、日期、操作（买入/卖出）、
+成交价/价格/现价、数量、止损、止盈，其余列忽略。没有日期列的行使用--date，
+未指定时使用工作簿的修改日期；没有操作列的行按买入处理。
+"""
+import argparse
+import csv
+import os
+import re
+from datetime import datetime
+
+import numpy as np
+from openpyxl import load_workbook
+
+from backtest import holding_state, simulate
+from barcache import get_bars
+from bars import format_dates, to_datetime64
+from indicators import macd
+from mairui import map_concurrent, print_usage
+from mockTrack import LICENSE
+from rolling import TrailingZScore, zscore_series
+
+JOURNAL = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "选股操作记录.xlsx")
+COLUMNS = {
+    "code": ("代码", "股票代码"),
+    "name": ("名称", "股票名称"),
+    "date": ("日期", "交易日期", "买入日期", "时间"),
+    "side": ("操作", "方向", "买卖"),
+    "price": ("成交价", "价格", "现价"),
+    "shares": ("数量", "股数"),
+    "stop": ("止损",),
+    "target": ("止盈",),
+}
+_NUMBER = re.compile(r"-?\d+(?:\.\d+)?")
+
+
+def _number(value):
+    """单元格转数字，"46.78（2.2%）" 这样的文字取开头的数"""
+    if isinstance(value, (int, float)):
+        return float(value)
+    match = _NUMBER.search(str(value or ""))
+    return float(match.group()) if match else float("nan")
+
+
+def _code(value):
+    """代码列可能被存成数字（159887）或带后缀（600036.SH），统一成6位代码"""
+    if isinstance(value, float):
+        value = int(value)
+    return str(value).strip().split(".")[0].zfill(6)
+
+
+def read_journal(path=JOURNAL, default_date=None):
+    """
+    以只读流式方式读取工作簿中的全部交易，返回 {代码: [交易字典, ...]}（各代码内按日期排序）
+
+    交易字典包含 code/name/date(datetime64[s])/side(1买入,-1卖出)/price/shares/stop/target/sheet/row。
+    """
+    workbook = load_workbook(path, read_only=True, data_only=True)
+    try:
+        if default_date is None:
+            modified = workbook.properties.modified or datetime.now()
+            default_date = modified.strftime("%Y-%m-%d")
+        trades = {}
+        for sheet in workbook.worksheets:
+            rows = sheet.iter_rows(values_only=True)
+            header = next(rows, None)
+            if not header:
+                continue
+            names = [str(cell).strip() if cell is not None else "" for cell in header]
+            index = {field: next((names.index(alias) for alias in aliases if alias in names), None)
+                     for field, aliases in COLUMNS.items()}
+            if index["code"] is None or index["price"] is None:
+                continue
+
+            def cell(row, field):
+                column = index[field]
+                return row[column] if column is not None and column < len(row) else None
+
+            for number, row in enumerate(rows, 2):
+                if cell(row, "code") in (None, ""):
+                    continue
+                code = _code(cell(row, "code"))
+                side = str(cell(row, "side") or "买入")
+                trades.setdefault(code, []).append({
+                    "code": code,
+                    "name": str(cell(row, "name") or code),
+                    "date": to_datetime64(cell(row, "date") or default_date).astype("datetime64[D]").astype("datetime64[s]"),
+                    "side": -1 if "卖" in side else 1,
+                    "price": _number(cell(row, "price")),
+                    "shares": _number(cell(row, "shares")),
+                    "stop": _number(cell(row, "stop")),
+                    "target": _number(cell(row, "target")),
+                    "sheet": sheet.title,
+                    "row": number,
+                })
+    finally:
+        workbook.close()
+    for rows in trades.values():
+        rows.sort(key=lambda trade: trade["date"])
+    return trades
+
+
+def _exits(trades, entries, bars):
+    """
+    每笔买入的离场位置和价格：之后有卖出记录时按先进先出配对；
+    否则按止损/止盈在之后的K线中首次触及的位置离场；都没有时按最后收盘价计（持有中）
+    返回 (离场下标, 离场价, 离场方式) 三个数组。
+    """
+    n = len(bars["t"])
+    exit_index = np.full(len(trades), n - 1)
+    exit_price = np.full(len(trades), bars["c"][-1])
+    how = np.array(["持有中"] * len(trades), dtype=object)
+    open_buys = []
+    for i, trade in enumerate(trades):
+        if trade["side"] > 0:
+            open_buys.append(i)
+        elif open_buys:
+            buy = open_buys.pop(0)
+            exit_index[buy], exit_price[buy], how[buy] = entries[i], trade["price"], "卖出"
+    for buy in open_buys:
+        start = entries[buy] + 1
+        stop, target = trades[buy]["stop"], trades[buy]["target"]
+        hit_stop = bars["l"][start:] <= stop if not np.isnan(stop) else np.zeros(n - start, dtype=bool)
+        hit_target = bars["h"][start:] >= target if not np.isnan(target) else np.zeros(n - start, dtype=bool)
+        hit = hit_stop | hit_target
+        if hit.any():
+            first = int(np.argmax(hit))
+            exit_index[buy] = start + first
+            # 同一根K线同时触及时保守地按止损计
+            exit_price[buy], how[buy] = (stop, "止损") if hit_stop[first] else (target, "止盈")
+    return exit_index, exit_price, how
+
+
+def reconcile_code(code, trades, license=LICENSE):
+    """
+    对账一支股票的全部交易：只读取一次K线（优先本地缓存），交易日期用二分查找一次性对齐
+
+    返回 (每笔交易一行的字典列表, 错误信息)。信号Z-score与mockTrack口径一致（第i天只用之前的DIF），
+    另给出过去一年窗口的Z-score（与GUI报告一致）；策略收益为同一持有区间内Z-score策略权益的变化。
+    """
+    bars, error = get_bars("hsstock/history", code, "d", license, "n")
+    if error:
+        return None, error
+    if len(bars["t"]) < 2:
+        return None, f"数据不足（需要至少2个数据点，当前有{len(bars['t'])}个）"
+    diff = macd(bars["c"])["diff"]
+    z_scores, _, _ = zscore_series(diff, exclude_current=True)
+    trailing = TrailingZScore(bars["t"], diff)
+    held = holding_state(z_scores)
+    equity = simulate(z_scores, bars["c"])["equity"]
+
+    # 交易日期当天（非交易日取之前最近一个交易日）的下标
+    dates = np.array([trade["date"] for trade in trades], dtype="datetime64[s]")
+    entries = np.searchsorted(bars["t"], dates + np.timedelta64(1, "D"), side="left") - 1
+    valid = entries >= 0
+    entries = np.maximum(entries, 0)
+    prices = np.array([trade["price"] for trade in trades])
+    close = bars["c"][entries]
+    exit_index, exit_price, how = _exits(trades, entries, bars)
+
+    with np.errstate(invalid="ignore", divide="ignore"):
+        slippage = prices / close - 1.0
+        realized = exit_price / prices - 1.0
+        strategy = equity[exit_index] / equity[entries] - 1.0
+
+    results = []
+    for i, trade in enumerate(trades):
+        row = {
+            **trade,
+            "bar_date": bars["t"][entries[i]] if valid[i] else None,
+            "close": float(close[i]) if valid[i] else float("nan"),
+            "diff": float(diff[entries[i]]) if valid[i] else float("nan"),
+            "z_score": float(z_scores[entries[i]]) if valid[i] else float("nan"),
+            "z_score_1y": float(trailing.z_score[entries[i]]) if valid[i] else float("nan"),
+            "strategy_held": bool(held[entries[i]]) if valid[i] else False,
+            "slippage": float(slippage[i]) if valid[i] else float("nan"),
+            "exit": how[i] if trade["side"] > 0 else "",
+            "exit_date": bars["t"][exit_index[i]] if trade["side"] > 0 and valid[i] else None,
+            "realized": float(realized[i]) if trade["side"] > 0 and valid[i] else float("nan"),
+            "strategy": float(strategy[i]) if trade["side"] > 0 and valid[i] else float("nan"),
+            "error": None if valid[i] else "交易日期早于缓存数据",
+        }
+        results.append(row)
+    return results, None
+
+
+def reconcile(journal, license=LICENSE, concurrency=8):
+    """并发对账全部代码，返回 (所有交易行, {代码: 错误信息})"""
+    codes = list(journal)
+    rows, errors = [], {}
+    for code, (result, error) in zip(codes, map_concurrent(lambda code: reconcile_code(code, journal[code], license),
+                                                            codes, concurrency)):
+        if error:
+            errors[code] = error
+        else:
+            rows.extend(result)
+    return rows, errors
+
+
+def print_reconciliation(rows, errors):
+    """打印对账表和汇总"""
+    print("="*80)
+    print(f"{'日期':<10} {'代码':<8} {'名称':<8} {'操作':<4} {'价格':<8} {'收盘':<8} {'滑点':<8} "
+          f"{'Z-score':<8} {'一年Z':<8} {'策略持仓':<6} {'离场':<6} {'实际收益':<8} {'策略收益':<8}")
+    print("-"*80)
+    for row in rows:
+        date = format_dates(np.array([row["date"]]))[0]
+        action = "买入" if row["side"] > 0 else "卖出"
+        held = "是" if row["strategy_held"] else "否"
+        print(f"{date}  {row['code']:<10} {row['name']:<8} {action}  {row['price']:<10.2f} {row['close']:<10.2f} "
+              f"{row['slippage']:<10.2%} {row['z_score']:<10.2f} {row['z_score_1y']:<10.2f} {held:<8} "
+              f"{row['exit']:<6} {row['realized']:<10.2%} {row['strategy']:<10.2%} {row['error'] or ''}")
+    print("-"*80)
+    buys = [row for row in rows if row["side"] > 0 and not row["error"]]
+    if buys:
+        print(f"买入 {len(buys)} 笔，平均滑点 {np.nanmean([row['slippage'] for row in buys]):.2%}，"
+              f"平均实际收益 {np.nanmean([row['realized'] for row in buys]):.2%}，"
+              f"同期策略平均收益 {np.nanmean([row['strategy'] for row in buys]):.2%}，"
+              f"买入时策略持仓 {sum(row['strategy_held'] for row in buys)} 笔")
+    for code, error in errors.items():
+        print(f"{code} {error}")
+    print("="*80)
+
+
+def write_csv(rows, path):
+    fields = ["sheet", "row", "code", "name", "date", "side", "price", "shares", "stop", "target", "bar_date", "close",
+              "slippage", "diff", "z_score", "z_score_1y", "strategy_held", "exit", "exit_date", "realized", "strategy", "error"]
+    with open(path, "w", newline="", encoding="utf-8-sig") as f:
+        writer = csv.DictWriter(f, fields, extrasaction="ignore")
+        writer.writeheader()
+        for row in rows:
+            writer.writerow({**row, **{name: str(row[name])[:10] for name in ("date", "bar_date", "exit_date")
+                                       if row[name] is not None}})
+
+
+def main():
+    parser = argparse.ArgumentParser(description="选股操作记录与Z-score信号对账")
+    parser.add_argument("path", nargs="?", default=JOURNAL, help="工作簿路径，默认仓库根目录的选股操作记录.xlsx")
+    parser.add_argument("--date", default=None, help="没有日期列时使用的交易日期 YYYY-MM-DD，默认工作簿修改日期")
+    parser.add_argument("--output", default=None, help="同时写入CSV文件")
+    args = parser.parse_args()
+
+    journal = read_journal(args.path, args.date)
+    rows, errors = reconcile(journal)
+    print_reconciliation(rows, errors)
+    if args.output:
+        write_csv(rows, args.output)
+        print(f"对账结果已写入 {args.output}")
+    print_usage()
+
+
+if __name__ == "__main__":
+    main()
@@ -1,8 +1,14 @@
-import requests
-import json
+import sys
 import numpy as np
 from datetime import datetime, timedelta
 
+import client
+import dailystate
+from barcache import get_bars
+from bars import select
+from mairui import map_concurrent, print_usage, register_licenses
+import profiling
+
 STOCK_LIST = [
 {
 "code": "000001.SH",
@@ -84,65 +90,55 @@ STOCK_LIST = [
 
 # 固定API许可证
 LICENSE = "98BA60DF-D2DB-47CB-A454-2AC16CF968F5"
-# 5BEBFBE4-BE54-4525-91DA-5EC474A35191
-# 877AC725-4D2C-4107-9537-5B1EB5A56E74
-# CBD5265D-3CF4-4AFB-AA07-97A761D0E5AF
-# 98BA60DF-D2DB-47CB-A454-2AC16CF968F5
+# 备用许可证：LICENSE额度用完时依次切换
+register_licenses([
+    "5BEBFBE4-BE54-4525-91DA-5EC474A35191",
+    "877AC725-4D2C-4107-9537-5B1EB5A56E74",
+    "CBD5265D-3CF4-4AFB-AA07-97A761D0E5AF"
+])
 
 def analyze_stock(stock):
     """分析单支股票的MACD DIF值（过去两年数据）"""
-    # 构造API URL（不使用st和et参数）
-    # api_url = f"https://api.mairuiapi.com/hszbl/macd/{stock['code']}/d/{LICENSE}"
-    api_url = f"https://api.mairuiapi.com/hsindex/history/macd/{stock['code']}/d/{LICENSE}"
-    # api_url = f"https://api.mairuiapi.com/hsindex/history/macd/000001.SZ/d/CBD5265D-3CF4-4AFB-AA07-97A761D0E5AF?st=20240109&et=20260119"
-    try:
-        response = requests.get(api_url)
-        response.raise_for_status()
-        data = response.json()
-    except Exception as e:
-        return None, f"API请求失败: {str(e)}"
-    
-    # 检查API返回数据是否有效
-    if not data or not isinstance(data, list):
-        return None, "API返回数据格式错误"
+    # 设置了MAIRUI_SERVICE时由常驻的分析服务计算
+    if client.SERVICE_URL:
+        return client.zscore(stock, "hsindex/history/macd", LICENSE, days=365*2)
+    # 优先使用本地缓存，只增量请求缺失的数据（不使用st和et参数时为全部历史）
+    # bars, error = get_bars("hszbl/macd", stock['code'], "d", LICENSE)
+    with profiling.stage("fetch", stock['code']):
+        bars, error = get_bars("hsindex/history/macd", stock['code'], "d", LICENSE)
+    if error:
+        return None, error
     
     # 获取当前日期并计算过去两年的起始日期
     current_date = datetime.now()
     two_years_ago = current_date - timedelta(days=365*2)
-    # 过滤过去两年的数据
-    filtered_data = []
-    for item in data:
-        try:
-            date_str = item["t"]
-            
-            # date_obj = datetime.strptime(date_str, "%Y-%m-%d")
-            date_obj = datetime.strptime(item["t"], "%Y-%m-%d %H:%M:%S")
-            if date_obj >= two_years_ago:
-                filtered_data.append(item)
-        except (ValueError, TypeError):
-            print("error")
-            continue
     
-    # 检查过滤后的数据是否有效
-    if len(filtered_data) < 2:
-        return None, f"数据不足（需要至少2个数据点，当前有{len(filtered_data)}个）"
+    # 过滤过去两年的数据（日期列有序，二分查找起始位置）
+    with profiling.stage("filter", stock['code']) as timing:
+        diff_values = select(bars, two_years_ago)["diff"]
+        timing.rows = len(diff_values)
     
-    # 提取diff值
-    diff_values = [item["diff"] for item in filtered_data]
+    # 检查过滤后的数据是否有效
+    if len(diff_values) < 2:
+        return None, f"数据不足（需要至少2个数据点，当前有{len(diff_values)}个）"
     
     # 计算统计值
-    mean_diff = np.mean(diff_values)
-    std_diff = np.std(diff_values)
+    with profiling.stage("stats", stock['code']):
+        mean_diff = np.mean(diff_values)
+        std_diff = np.std(diff_values)
+    
+        # 获取当前diff值
+        current_diff = diff_values[-1]
     
-    # 获取当前diff值
-    current_diff = diff_values[-1]
+        if not std_diff > 0:
+            return None, "标准差为0（窗口内DIF没有变化），无法计算Z-score"
     
-    # 计算Z-score
-    z_score = (current_diff - mean_diff) / std_diff
+        # 计算Z-score
+        z_score = (current_diff - mean_diff) / std_diff
     
-    # 计算推荐值
-    buy_diff = mean_diff + std_diff
-    sell_diff = mean_diff - std_diff
+        # 计算推荐值
+        buy_diff = mean_diff + std_diff
+        sell_diff = mean_diff - std_diff
     
     return {
         "code": stock["code"],
@@ -153,7 +149,15 @@ def analyze_stock(stock):
         "sell_diff": sell_diff
     }, None
 
+def update_stock(stock):
+    """增量更新模式：只请求新数据，在保存的窗口状态上滚动计算，结果格式与analyze_stock相同"""
+    return dailystate.update_stock(stock, "macdzs", "hsindex/history/macd", LICENSE, days=365*2)
+
 def main():
+    # python macdzs.py update 使用增量更新模式
+    # 加 --profile 或 --profile=文件 时统计各阶段耗时和API请求
+    args = profiling.setup(sys.argv[1:])
+    analyze = update_stock if "update" in args else analyze_stock
     print("="*80)
     print("MACD DIF值分析报告 (过去两年数据)")
     print(f"分析日期: {datetime.now().strftime('%Y-%m-%d')}")
@@ -163,8 +167,8 @@ def main():
     header = f"{'股票代码'}\t {'股票名称'} \t {'当前DIF'} \t {'Z-score'} \t {'推荐买入'} \t {'推荐卖出'}"
     print(header)
     print("-" * len(header))
-    for stock in STOCK_LIST:
-        result, error = analyze_stock(stock)
+    # 并发获取和分析，结果按STOCK_LIST原顺序打印
+    for stock, (result, error) in zip(STOCK_LIST, map_concurrent(analyze, STOCK_LIST)):
         
         if error:
             # 错误行也使用相同宽度对齐
@@ -172,6 +176,8 @@ def main():
         else:
             print(f"{result['code']}\t | {result['name']}\t {result['current_diff']:.2f}\t\t|{result['z_score']:.1f}\t\t | {result['buy_diff']:.1f}\t\t | {result['sell_diff']:.1f}") 
     print("="*80)
+    print_usage()
+    profiling.report()
     print("分析完成！")
 
 if __name__ == "__main__":
@@ -1,5 +1,6 @@
-import requests
-import json
+import queue
+import sys
+import threading
 import numpy as np
 import tkinter as tk
 from tkinter import ttk, scrolledtext, messagebox
@@ -7,11 +8,19 @@ from datetime import datetime, timedelta
 from dateutil.relativedelta import relativedelta
 from tkcalendar import Calendar
 
+import client
+import profiling
+import signals
+from chart import DifChart
+from barcache import MAX_AGE, get_bars
+from rolling import TrailingZScore
+from seriescache import SeriesCache
+
 class MACDAnalyzerGUI:
     def __init__(self, root):
         self.root = root
         self.root.title("MACD DIF Z-score分析工具 - A股日线")
-        self.root.geometry("850x650")
+        self.root.geometry("850x900")
         
         # 创建主框架
         main_frame = ttk.Frame(root, padding="10")
@@ -36,9 +45,39 @@ class MACDAnalyzerGUI:
         # 日期选择按钮
         ttk.Button(time_frame, text="选择日期", command=self.select_date).grid(row=0, column=4, padx=5, pady=5)
         
-        # 分析按钮
-        self.analyze_btn = ttk.Button(main_frame, text="分析MACD DIF值", command=self.analyze)
-        self.analyze_btn.pack(pady=10)
+        # 分析按钮、取消按钮和进度状态
+        action_frame = ttk.Frame(main_frame)
+        action_frame.pack(pady=10)
+        self.analyze_btn = ttk.Button(action_frame, text="分析MACD DIF值", command=self.analyze)
+        self.analyze_btn.pack(side=tk.LEFT, padx=5)
+        self.cancel_btn = ttk.Button(action_frame, text="取消", command=self.cancel, state=tk.DISABLED)
+        self.cancel_btn.pack(side=tk.LEFT, padx=5)
+        self.progress = ttk.Progressbar(action_frame, mode="indeterminate", length=120)
+        self.progress.pack(side=tk.LEFT, padx=5)
+        self.status = tk.StringVar(value="就绪")
+        ttk.Label(action_frame, textvariable=self.status).pack(side=tk.LEFT, padx=5)
+        
+        # 后台任务：结果通过队列交回主线程，job_id用于丢弃已取消任务的结果
+        self.results = queue.Queue()
+        self.job_id = 0
+        self.busy = False
+        self.series_cache = SeriesCache(maxsize=32, ttl=MAX_AGE)
+        self.signal_table = None  # 最近一次计算参考信号的Z-score历史表
+        self.signal_values = None
+        
+        # 日期拖动条：在已加载的序列上逐日查看Z-score变化
+        scrub_frame = ttk.Frame(main_frame)
+        scrub_frame.pack(fill=tk.X, pady=5)
+        ttk.Label(scrub_frame, text="按日期查看:").pack(side=tk.LEFT, padx=5)
+        self.scrubber = ttk.Scale(scrub_frame, from_=0, to=0, orient=tk.HORIZONTAL, command=self.on_scrub, state=tk.DISABLED)
+        self.scrubber.pack(side=tk.LEFT, fill=tk.X, expand=True, padx=5)
+        self.scrub_target = None  # (股票代码, Z-score历史表)
+        
+        # DIF走势图：DIF、推荐买入值/卖出值和Z-score，滚轮缩放、拖动平移、双击显示全部
+        chart_frame = ttk.LabelFrame(main_frame, text="DIF走势", padding="5")
+        chart_frame.pack(fill=tk.BOTH, expand=True, pady=5)
+        self.chart = DifChart(chart_frame, height=280)
+        self.chart.pack(fill=tk.BOTH, expand=True)
         
         # 结果显示区域
         result_frame = ttk.LabelFrame(main_frame, text="分析结果", padding="10")
@@ -78,7 +117,7 @@ class MACDAnalyzerGUI:
             messagebox.showerror("错误", f"日期选择器无法加载: {str(e)}")
     
     def analyze(self):
-        """执行MACD分析"""
+        """执行MACD分析：已缓存的股票直接计算，否则在后台线程获取数据"""
         stock_code = self.stock_code.get().strip()
         analysis_date = self.analysis_date.get()
         
@@ -94,49 +133,125 @@ class MACDAnalyzerGUI:
             messagebox.showerror("日期错误", "请输入正确的日期格式 (YYYY-MM-DD)")
             return
         
-        # 计算开始日期 (分析日期前1年)
-        start_date_obj = analysis_date_obj - relativedelta(years=1)
-        start_date = start_date_obj.strftime("%Y-%m-%d")
-        
-        # 构造API URL
-        api_url = f"https://api.mairuiapi.com/hsstock/history/macd/{stock_code}/d/f/B61FAD11-CE87-44C0-9C2A-6ABA4877CA11"
+        # 只改了分析日期时直接查内存中的Z-score历史表，不再请求
+        table = self.series_cache.get(stock_code)
+        if table is not None:
+            self.status.set("使用缓存数据")
+            with profiling.stage("render", stock_code):
+                self.show_report(stock_code, analysis_date_obj, table)
+            self.update_scrubber(stock_code, table, analysis_date_obj)
+            return
         
+        self.job_id += 1
+        job_id = self.job_id
+        self.set_busy(True, f"正在获取 {stock_code} 的数据...")
+        worker = threading.Thread(target=self.fetch_worker, args=(job_id, stock_code, analysis_date_obj), daemon=True)
+        worker.start()
+        self.root.after(100, self.poll_results)
+    
+    def fetch_worker(self, job_id, stock_code, analysis_date_obj):
+        """后台线程：获取数据（优先使用本地缓存，只增量请求缺失的数据），不直接操作界面"""
+        with profiling.stage("fetch", stock_code):
+            if client.SERVICE_URL:
+                bars, error = client.series(stock_code, "hsstock/history/macd", "B61FAD11-CE87-44C0-9C2A-6ABA4877CA11", "f")
+            else:
+                bars, error = get_bars("hsstock/history/macd", stock_code, "d", "B61FAD11-CE87-44C0-9C2A-6ABA4877CA11", "f")
+        self.results.put((job_id, stock_code, analysis_date_obj, bars, error))
+    
+    def poll_results(self):
+        """在主线程中检查后台任务的结果"""
         try:
-            response = requests.get(api_url)
-            response.raise_for_status()
-            data = response.json()
-        except requests.exceptions.RequestException as e:
-            messagebox.showerror("API错误", f"请求API失败: {e}")
+            job_id, stock_code, analysis_date_obj, bars, error = self.results.get_nowait()
+        except queue.Empty:
+            if self.busy:
+                self.root.after(100, self.poll_results)
+            return
+        if job_id != self.job_id:
+            # 已取消或被新任务替代的结果直接丢弃
+            self.root.after(100, self.poll_results)
+            return
+        self.set_busy(False, "就绪")
+        if error:
+            messagebox.showerror("API错误", error)
+            return
+        # 一次算出全部日期的Z-score历史，之后切换日期只查表
+        with profiling.stage("stats", stock_code) as timing:
+            table = TrailingZScore(bars["t"], bars["diff"])
+            timing.rows = len(table.dates)
+        self.series_cache.put(stock_code, table)
+        with profiling.stage("render", stock_code):
+            self.show_report(stock_code, analysis_date_obj, table)
+        self.update_scrubber(stock_code, table, analysis_date_obj)
+    
+    def cancel(self):
+        """取消当前任务：请求本身无法中断，完成后其结果会被丢弃"""
+        self.job_id += 1
+        self.set_busy(False, "已取消")
+    
+    def set_busy(self, busy, message):
+        """切换按钮和进度条状态"""
+        self.busy = busy
+        self.status.set(message)
+        if busy:
+            self.analyze_btn.config(state=tk.DISABLED)
+            self.cancel_btn.config(state=tk.NORMAL)
+            self.progress.start(10)
+        else:
+            self.analyze_btn.config(state=tk.NORMAL)
+            self.cancel_btn.config(state=tk.DISABLED)
+            self.progress.stop()
+    
+    def update_scrubber(self, stock_code, table, analysis_date_obj):
+        """把拖动条的范围设为该股票的全部交易日，并定位到分析日期"""
+        if len(table.dates) == 0:
+            self.scrubber.config(state=tk.DISABLED)
             return
-        except json.JSONDecodeError:
-            messagebox.showerror("API错误", "API返回数据格式错误")
+        index = max(int(np.searchsorted(table.dates, np.datetime64(analysis_date_obj + timedelta(days=1), "s"))) - 1, 0)
+        self.chart.show(table, index)
+        self.scrubber.config(state=tk.NORMAL, from_=0, to=len(table.dates) - 1)
+        # 程序设置位置时不触发on_scrub，保留用户输入的日期
+        self.scrub_target = None
+        self.scrubber.set(index)
+        self.scrub_target = (stock_code, table)
+    
+    def on_scrub(self, value):
+        """拖动时直接查表，不请求也不重新计算"""
+        if self.scrub_target is None:
             return
+        stock_code, table = self.scrub_target
+        self.chart.mark(int(float(value)))
+        date = table.dates[int(float(value))].astype(datetime)
+        date = datetime(date.year, date.month, date.day)
+        self.analysis_date.delete(0, tk.END)
+        self.analysis_date.insert(0, date.strftime("%Y-%m-%d"))
+        self.show_report(stock_code, date, table)
+    
+    def show_report(self, stock_code, analysis_date_obj, table):
+        """从预先算好的Z-score历史表中查询分析日期的结果并显示报告"""
+        analysis_date = analysis_date_obj.strftime("%Y-%m-%d")
+        
+        # 计算开始日期 (分析日期前1年)
+        start_date_obj = analysis_date_obj - relativedelta(years=1)
+        start_date = start_date_obj.strftime("%Y-%m-%d")
         
-        # 过滤数据在指定时间范围内的
-        filtered_data = []
-        for item in data:
-            date = item["t"]
-            if start_date <= date <= analysis_date:
-                filtered_data.append(item)
+        # 查询分析日期（含当天）过去1年窗口的统计值
+        stats = table.at(analysis_date_obj)
         
-        if not filtered_data:
+        if stats is None:
             messagebox.showinfo("无数据", "在指定时间范围内没有找到数据")
             return
         
-        # 提取diff值
-        diff_values = [item["diff"] for item in filtered_data]
-        
-        # 计算统计值
-        mean_diff = np.mean(diff_values)
-        std_diff = np.std(diff_values)
+        # 统计值
+        mean_diff = stats["mean"]
+        std_diff = stats["std"]
         
         # 获取当前diff值
-        current_diff = diff_values[-1]
+        current_diff = stats["current"]
         
         # 计算Z-score (a值)
-        a_value = (current_diff - mean_diff) / std_diff
-        comdiff = mean_diff + std_diff  # 推荐买入值
-        sealdiff = mean_diff - std_diff  # 推荐卖出值
+        a_value = stats["z_score"]
+        comdiff = stats["buy"]  # 推荐买入值
+        sealdiff = stats["sell"]  # 推荐卖出值
         
         # 清除结果文本
         self.result_text.config(state=tk.NORMAL)
@@ -146,7 +261,7 @@ class MACDAnalyzerGUI:
         self.result_text.insert(tk.END, "===== MACD DIF Z-score分析报告 =====\n")
         self.result_text.insert(tk.END, f"股票代码: {stock_code}\n")
         self.result_text.insert(tk.END, f"分析时间范围: {start_date} 到 {analysis_date} (1年窗口)\n")
-        self.result_text.insert(tk.END, f"数据点数: {len(filtered_data)}\n")
+        self.result_text.insert(tk.END, f"数据点数: {stats['count']}\n")
         self.result_text.insert(tk.END, f"DIF均值: {mean_diff:.4f}\n")
         self.result_text.insert(tk.END, f"DIF标准差: {std_diff:.4f}\n")
         self.result_text.insert(tk.END, f"当前DIF值: {current_diff:.4f}\n")
@@ -162,8 +277,33 @@ class MACDAnalyzerGUI:
         else:
             self.result_text.insert(tk.END, "❌ 当前Z-score (a) < 0.5，暂不建议买入\n")
         
-        # 添加其他参考信号
+        # 添加其他参考信号：分析日期（含当天）之前最近一次出现的日期
         self.result_text.insert(tk.END, "\n其他买入参考信号:\n")
-        self.result_text.insert(tk.END, "- DIF上穿DEA线（金叉）\n")
-        self.result_text.insert(tk.END, "- DIF值从负转正（上穿0轴）\n")
-        self.result_te
\ No newline at end of file
+        hints = self.reference_signals(table)
+        end = int(np.searchsorted(table.dates, stats["date"], side="right"))
+        for name, title in (("golden_cross", "DIF上穿DEA线（金叉）"), ("zero_up", "DIF值从负转正（上穿0轴）")):
+            hits = np.flatnonzero(hints[name][:end])
+            if len(hits) == 0:
+                text = "未出现"
+            elif hits[-1] == end - 1:
+                text = "当天出现"
+            else:
+                text = f"最近一次 {np.datetime_as_string(table.dates[hits[-1]], unit='D')}（{end - 1 - hits[-1]}个交易日前）"
+            self.result_text.insert(tk.END, f"- {title}: {text}\n")
+        self.result_text.config(state=tk.DISABLED)
+    
+    def reference_signals(self, table):
+        """由DIF计算DEA后得到金叉、上穿0轴信号，同一张表只算一次"""
+        if self.signal_table is not table:
+            frame = signals.Frame({"diff": table.values})
+            self.signal_values = frame.evaluate_all({"golden_cross": signals.GOLDEN_CROSS, "zero_up": signals.ZERO_UP})
+            self.signal_table = table
+        return self.signal_values
+
+if __name__ == "__main__":
+    # python macdzsgui.py --profile 关闭窗口时输出各阶段耗时和API请求统计
+    profiling.setup(sys.argv[1:])
+    root = tk.Tk()
+    app = MACDAnalyzerGUI(root)
+    root.mainloop()
+    profiling.report()
@@ -0,0 +1,291 @@
+"""麦蕊API请求的公共部分：拼接URL、复用连接、限速、失败重试、许可证轮换、合并重复请求、并发获取"""
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import requests
+from requests.adapters import HTTPAdapter
+
+import profiling
+
+# 可用环境变量指向本地的mockapi.py替身服务
+BASE_URL = os.environ.get("MAIRUI_BASE_URL", "https://api.mairuiapi.com")
+
+CONCURRENCY = 8        # 默认并发请求数
+RATE_LIMIT = 30.0      # 每个许可证每秒最多请求次数
+RATE_LIMITS = {}       # 个别许可证的限速，{许可证: 每秒次数}
+MAX_RETRIES = 3        # 429/5xx/网络错误的重试次数
+BACKOFF = 0.5          # 第n次重试前等待 BACKOFF * 2**n 秒
+TIMEOUT = 30           # 单次请求超时秒数
+QUOTA_COOLDOWN = 3600  # 额度用完的许可证停用多少秒后重新尝试（常驻的分析服务不会永久失去许可证）
+
+_session = requests.Session()
+_session.mount("https://", HTTPAdapter(pool_connections=4, pool_maxsize=32))
+_session.mount("http://", HTTPAdapter(pool_connections=4, pool_maxsize=32))
+
+
+class RateLimiter:
+    """按许可证分别限速：两次请求之间至少间隔 1/rate 秒，线程安全"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._next_slot = {}
+
+    def wait(self, license):
+        rate = RATE_LIMITS.get(license, RATE_LIMIT)
+        if not rate:
+            return
+        with self._lock:
+            now = time.monotonic()
+            slot = max(now, self._next_slot.get(license, now))
+            self._next_slot[license] = slot + 1.0 / rate
+        if slot > now:
+            time.sleep(slot - now)
+
+
+_limiter = RateLimiter()
+
+
+def build_url(endpoint, code, period, license, adjust=None, st=None, et=None):
+    """
+    拼接API地址，例如 build_url("hsstock/history/macd", "600036", "d", LICENSE, "n")
+    得到 .../hsstock/history/macd/600036/d/n/LICENSE；st/et为YYYYMMDD格式的起止日期
+    """
+    parts = [BASE_URL, endpoint, code, period]
+    if adjust:
+        parts.append(adjust)
+    parts.append(license)
+    url = "/".join(parts)
+    params = [f"{name}={value}" for name, value in (("st", st), ("et", et)) if value]
+    if params:
+        url += "?" + "&".join(params)
+    return url
+
+
+def license_of(url):
+    """从URL中取出许可证（路径的最后一段）"""
+    return url.split("?", 1)[0].rstrip("/").rsplit("/", 1)[-1]
+
+
+def _retry_delay(attempt, response=None):
+    """重试前的等待时间，优先使用服务端的Retry-After"""
+    if response is not None:
+        try:
+            return float(response.headers.get("Retry-After"))
+        except (TypeError, ValueError):
+            pass
+    return BACKOFF * 2 ** attempt
+
+
+class LicensePool:
+    """
+    许可证池：记录每个许可证的请求次数、错误次数，额度用完后自动换下一个
+
+    池中的顺序就是轮换顺序；URL里自带的许可证总是最先尝试。
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.licenses = []
+        self.usage = {}
+
+    def register(self, licenses):
+        """加入许可证（去重，保持顺序）"""
+        with self._lock:
+            for license in licenses:
+                if license and license not in self.usage:
+                    self.licenses.append(license)
+                    self.usage[license] = {"requests": 0, "errors": 0, "exhausted": False, "exhausted_at": 0.0}
+
+    def candidates(self, license):
+        """本次请求可以使用的许可证，按尝试顺序排列；停用超过QUOTA_COOLDOWN秒的许可证重新启用"""
+        self.register([license])
+        with self._lock:
+            now = time.monotonic()
+            for usage in self.usage.values():
+                if usage["exhausted"] and now - usage["exhausted_at"] >= QUOTA_COOLDOWN:
+                    usage["exhausted"] = False
+            ordered = [license] + [key for key in self.licenses if key != license]
+            return [key for key in ordered if not self.usage[key]["exhausted"]]
+
+    def reset(self, license=None):
+        """重新启用一个（默认全部）已标记为额度用完的许可证"""
+        with self._lock:
+            for key, usage in self.usage.items():
+                if license is None or key == license:
+                    usage["exhausted"] = False
+
+    def snapshot(self):
+        """各许可证使用情况的副本"""
+        with self._lock:
+            return {key: dict(value) for key, value in self.usage.items()}
+
+    def record(self, license, error=False, exhausted=False):
+        with self._lock:
+            usage = self.usage[license]
+            usage["requests"] += 1
+            usage["errors"] += int(error)
+            if exhausted:
+                usage["exhausted"] = True
+                usage["exhausted_at"] = time.monotonic()
+
+
+class _Call:
+    """正在进行中的一次请求，相同URL的其他线程等待它的结果"""
+
+    def __init__(self):
+        self.done = threading.Event()
+        self.result = (None, "API请求失败: 请求中断")
+
+
+_pool = LicensePool()
+_inflight = {}
+_inflight_lock = threading.Lock()
+_counters = {"calls": 0, "coalesced": 0}
+
+# 返回内容中出现这些词时认为是请求过于频繁（限流），退避后重试，不停用许可证；先于额度判断
+RATE_LIMIT_WORDS = ("频繁", "过多", "过快", "稍后", "每秒", "每分钟", "too many", "rate limit")
+# 返回内容中出现这些词时认为许可证额度用完或失效
+QUOTA_WORDS = ("已达上限", "额度", "已用完", "过期", "到期", "无效",
+               "expired", "invalid licen", "license invalid", "licence invalid")
+
+
+def register_licenses(licenses):
+    """把备用许可证加入池中，额度用完时按顺序切换"""
+    _pool.register(licenses)
+
+
+def reset_licenses(license=None):
+    """重新启用额度用完的许可证（例如额度按天重置后）"""
+    _pool.reset(license)
+
+
+def usage():
+    """本次运行的调用统计：总调用数、合并掉的重复请求数以及每个许可证的使用情况"""
+    return {"calls": _counters["calls"], "coalesced": _counters["coalesced"], "licenses": _pool.snapshot()}
+
+
+def print_usage():
+    """打印本次运行的API调用统计"""
+    stats = usage()
+    used = [f"{key[:8]}: {value['requests']}次" + ("(额度已用完)" if value["exhausted"] else "")
+            for key, value in stats["licenses"].items() if value["requests"] or value["exhausted"]]
+    print(f"本次API调用: {stats['calls']}次，合并重复请求: {stats['coalesced']}次  " + "  ".join(used))
+
+
+def _has_words(data, words):
+    """已解析的返回内容中是否出现words中的词（正常数据是列表，不做文本查找）"""
+    if isinstance(data, list):
+        return False
+    text = str(data).lower()
+    return any(word in text for word in words)
+
+
+def _is_rate_limited(data):
+    """判断返回内容是否为请求过于频繁的提示"""
+    return _has_words(data, RATE_LIMIT_WORDS)
+
+
+def _is_quota_error(data):
+    """判断返回内容是否为许可证额度用完/失效的提示，限流提示不算"""
+    return not _is_rate_limited(data) and _has_words(data, QUOTA_WORDS)
+
+
+def _fetch_once(url, license):
+    """用一个许可证请求，返回 (数据, 错误信息, 额度是否用完)；429、限流提示、5xx和网络错误会退避重试"""
+    for attempt in range(MAX_RETRIES + 1):
+        _limiter.wait(license)
+        try:
+            sent = time.perf_counter()
+            response = _session.get(url, timeout=TIMEOUT)
+            latency = time.perf_counter() - sent
+            if profiling.ENABLED and response.status_code != 200:
+                profiling.record_request(url, response.status_code, latency, 0.0, len(response.content), 0)
+            if (response.status_code == 429 or response.status_code >= 500) and attempt < MAX_RETRIES:
+                _pool.record(license, error=True)
+                time.sleep(_retry_delay(attempt, response))
+                continue
+            if response.status_code in (401, 402, 403):
+                _pool.record(license, error=True, exhausted=True)
+                return None, f"API请求失败: 许可证{license[:8]}额度已用完或无效", True
+            response.raise_for_status()
+            decoded = time.perf_counter()
+            try:
+                data = response.json()
+            except ValueError:
+                data = response.text
+            if _is_rate_limited(data):
+                _pool.record(license, error=True)
+                if attempt < MAX_RETRIES:
+                    time.sleep(_retry_delay(attempt, response))
+                    continue
+                return None, f"API请求失败: 请求过于频繁 {str(data)[:100]}", False
+            if _is_quota_error(data):
+                _pool.record(license, error=True, exhausted=True)
+                return None, f"API请求失败: 许可证{license[:8]}额度已用完或无效", True
+            if profiling.ENABLED:
+                profiling.record_request(url, response.status_code, latency, time.perf_counter() - decoded,
+                                         len(response.content), len(data) if isinstance(data, list) else 0)
+        except (requests.exceptions.ConnectionError, requests.exceptions.Timeout) as e:
+            _pool.record(license, error=True)
+            if attempt < MAX_RETRIES:
+                time.sleep(_retry_delay(attempt))
+                continue
+            return None, f"API请求失败: {str(e)}", False
+        except Exception as e:
+            _pool.record(license, error=True)
+            return None, f"API请求失败: {str(e)}", False
+        _pool.record(license)
+        break
+    if not isinstance(data, list):
+        return None, "API返回数据格式错误", False
+    return data, None, False
+
+
+def _fetch_with_pool(url):
+    """依次尝试池中未用完额度的许可证"""
+    license = license_of(url)
+    error = "API请求失败: 所有许可证额度已用完"
+    for key in _pool.candidates(license):
+        data, error, exhausted = _fetch_once(url.replace(license, key), key)
+        if not exhausted:
+            return data, error
+    return None, error
+
+
+def fetch_json(url):
+    """
+    请求API并返回 (数据列表, 错误信息)
+
+    相同URL（不论使用哪个许可证）同时只发一次请求，其余调用等待并共享结果；
+    许可证额度用完时自动换用池中的下一个。
+    """
+    key = url.replace(license_of(url), "")
+    with _inflight_lock:
+        _counters["calls"] += 1
+        call = _inflight.get(key)
+        leader = call is None
+        if leader:
+            call = _inflight[key] = _Call()
+        else:
+            _counters["coalesced"] += 1
+    if not leader:
+        call.done.wait()
+        return call.result
+    try:
+        call.result = _fetch_with_pool(url)
+    finally:
+        with _inflight_lock:
+            del _inflight[key]
+        call.done.set()
+    return call.result
+
+
+def map_concurrent(func, items, concurrency=CONCURRENCY):
+    """用线程池并发执行func，结果按items原来的顺序返回"""
+    items = list(items)
+    if concurrency <= 1 or len(items) <= 1:
+        return [func(item) for item in items]
+    with ThreadPoolExecutor(max_workers=min(concurrency, len(items))) as pool:
+        return list(pool.map(func, items))
@@ -1,144 +1,110 @@
-import requests
-import json
-import numpy as np
-from datetime import datetime, timedelta
+import sys
+
+import client
+import signals
+from backtest import BUY_THRESHOLD, SELL_THRESHOLD, WARMUP, print_ledger, signal_state, simulate
+from barcache import get_bars
+from bars import select
+from indicators import macd
+from mairui import print_usage, register_licenses
+import profiling
 
 STOCK_LIST = [
     {"code": "603993.SZ", "name": "科大讯飞"}
 ]
 
 # 固定API许可证
-# LICENSE = "CBD5265D-3CF4-4AFB-AA07-97A761D0E5AF"
-# LICENSE = "5BEBFBE4-BE54-4525-91DA-5EC474A35191"
-# LICENSE = "877AC725-4D2C-4107-9537-5B1EB5A56E74"
 LICENSE = "98BA60DF-D2DB-47CB-A454-2AC16CF968F5"
+# 备用许可证：LICENSE额度用完时依次切换
+register_licenses([
+    "CBD5265D-3CF4-4AFB-AA07-97A761D0E5AF",
+    "5BEBFBE4-BE54-4525-91DA-5EC474A35191",
+    "877AC725-4D2C-4107-9537-5B1EB5A56E74"
+])
 
-def analyze_stock(stock):
-    """分析单支股票的MACD DIF值（过去两年数据）"""
-    api_stock_url = f"https://api.mairuiapi.com/hsstock/history/{stock["code"]}/d/n/{LICENSE}?st=20200101&et=20260120"
-    api_macd_url = f"https://api.mairuiapi.com/hsstock/history/macd/{stock["code"]}/d/n/{LICENSE}?st=20200101&et=20260120"
-    try:
-        resMacd = requests.get(api_macd_url)
-        resMacd.raise_for_status()
-        macdData = resMacd.json()
+# 默认使用API返回的diff（从上市首日开始计算EMA）；设为True时在本地由收盘价计算MACD，只请求K线接口
+LOCAL_MACD = False
+# 本地计算时从LEAD_START开始取数据（约240个交易日，多于compare_diff的burn_in），EMA收敛后再截取回测区间
+LEAD_START = "20190101"
 
-        resStock = requests.get(api_stock_url)
-        resStock.raise_for_status()
-        stockData = resStock.json()
-    except Exception as e:
-        return None, f"API请求失败: {str(e)}"
-    
-    # 检查API返回数据是否有效
-    if not macdData or not isinstance(macdData, list):
-        return None, "macdData API返回数据格式错误"
-    
+# 买卖条件：可以换成signals中各条件的组合，例如 signals.GOLDEN_CROSS & (signals.Z_SCORE > 0.5)
+# （设置了MAIRUI_SERVICE时由服务端按Z-score阈值回测，不使用这里的条件）
+ENTRY = signals.Z_SCORE > BUY_THRESHOLD
+EXIT = signals.Z_SCORE < SELL_THRESHOLD
 
-    if not stockData or not isinstance(stockData, list):
-        return None, "stockData API返回数据格式错误"
+def load_series(stock, market="hsstock", local_macd=LOCAL_MACD):
+    """获取单支股票（market为hsindex时为指数）的日期、收盘价和DIF序列"""
+    # 个股接口带除权类型n（不复权），指数接口没有这一段；优先使用本地缓存
+    adjust = "n" if market == "hsstock" else None
+    if not local_macd:
+        macdData, error = get_bars(f"{market}/history/macd", stock['code'], "d", LICENSE, adjust, st="20200101", et="20260120")
+        if error:
+            return None, error
+    stockData, error = get_bars(f"{market}/history", stock['code'], "d", LICENSE, adjust,
+                               st=LEAD_START if local_macd else "20200101", et="20260120")
+    if error:
+        return None, error
+    if local_macd:
+        # 在含前置数据的完整序列上计算，再截取回测区间
+        stockData = select({**stockData, "diff": macd(stockData["c"])["diff"]}, "20200101")
     
     # 检查过滤后的数据是否有效
-    if len(stockData) < 2:
-        return None, f"数据不足（需要至少2个数据点，当前有{len(stockData)}个）"
+    if len(stockData["t"]) < 2:
+        return None, f"数据不足（需要至少2个数据点，当前有{len(stockData['t'])}个）"
     
     # 提取diff值
-    diff_values = [item["diff"] for item in macdData]
-    stock_values = [item["c"] for item in stockData]
+    stock_values = stockData["c"]
+    diff_values = stockData["diff"] if local_macd else macdData["diff"]
     
     if(len(diff_values) != len(stock_values)):
         return None, f"长度不一致，{len(diff_values)} {len(stock_values)}"
     
-    cash = 1000000.0  # 初始本金100万
-    position = 0.0     # 持仓数量（股）
-    last_buy_price = None  # 记录上一次买入价格
-    total_profit = 0.0   # 总收益
-      # 模拟交易
-     # 打印表头
-    print("="*80)
-    print(f"{'日期':<10} {'操作':<6} {'价格':<10} {'diff':<10} {'ZScore':<10} {'本次收益':<12} {'总收益':<12}")
-    print("-"*80)
-    position = 0
-    # 逐日计算并执行交易（从索引2开始，即第3个数据点）
-    for i in range(200, len(diff_values)):
-        # 计算当前zScore（使用前i个历史数据）
-        hist_diff = diff_values[:i]  # 历史diff值（0到i-1）
-        if len(hist_diff) < 2:
-            continue  # 跳过不足2个历史数据的点
-        
-        mean_diff = np.mean(hist_diff)
-        std_diff = np.std(hist_diff)
-        if std_diff == 0:  # 避免除以0错误
-            continue
-            
-        current_diff = diff_values[i]
-        z_score = (current_diff - mean_diff) / std_diff
-        
-        # 当前日期和价格
-        current_date = stockData[i]['t']
-        current_price = stock_values[i]
-        
-        # 策略执行
-        if z_score > 1 and position == 0:  # 买入条件
-            # 计算买入股数
-            position = cash / current_price
-            cash = cash - position * current_price
-            last_buy_price = current_price
-            
-            # 计算总收益（买入后总价值=100万，总收益=0）
-            total_profit = cash + position * current_price - 1000000
-            
-            # 打印买入日志
-            print(f"{current_date}  买入   {current_price:<10.2f} {current_diff:<10.4f} {z_score:<10.4f} {0:<12.2f} {total_profit:<12.2f}")
-        
-        elif z_score < -1 and position > 0:  # 卖出条件
-            # 计算本次卖出收益
-            if last_buy_price is not None:
-                profit_this_trade = (current_price - last_buy_price) * position
-            else:
-                profit_this_trade = 0
-                
-            # 卖出操作
-            cash += position * current_price
-            position = 0.0
-            last_buy_price = None
-            
-            # 计算总收益
-            total_profit = cash + position * current_price - 1000000
-            
-            # 打印卖出日志
-            print(f"{current_date}  卖出   {current_price:<10.2f} {current_diff:<10.4f} {z_score:<10.4f} {profit_this_trade:<12.2f} {total_profit:<12.2f}")
-    
-    # 计算最终收益
-    if position != 0:
-        # 计算本次卖出收益
-        if last_buy_price is not None:
-            profit_this_trade = (current_price - last_buy_price) * position
-        else:
-            profit_this_trade = 0
-            
-        # 卖出操作
-        cash += position * current_price
-        position = 0.0
-        last_buy_price = None
-        
-        # 计算总收益
-        total_profit = cash + position * current_price - 1000000
-        
-        # 打印卖出日志
-        print(f"{current_date}  卖出   {current_price:<10.2f} {current_diff:<10.4f} {z_score:<10.4f} {profit_this_trade:<12.2f} {total_profit:<12.2f}")
-    final_value = cash + position * stock_values[-1]  # 按最后一天收盘价计算
-    profit = final_value - 1000000.0
-    
-    # 打印最终结果
-    print("-"*80)
-    print(f"最终收益: {profit:.2f} 元")
-    print(f"总收益: {total_profit:.2f} 元")
-    print("="*80)
+    return {
+        "dates": stockData["t"],
+        "close": stock_values,
+        "diff": diff_values
+    }, None
+
+def analyze_stock(stock, verbose=True):
+    """分析单支股票的MACD DIF值（过去两年数据），verbose为False时不打印交易流水"""
+    # 设置了MAIRUI_SERVICE时由常驻的分析服务回测
+    if client.SERVICE_URL:
+        ledger, error = client.backtest(stock['code'], "hsstock", LICENSE)
+        if error:
+            return None, error
+        if verbose:
+            print_ledger(ledger)
+        return ledger["final_profit"], None
+    with profiling.stage("load", stock['code']) as timing:
+        series, error = load_series(stock)
+        timing.rows = len(series["diff"]) if series else 0
+    if error:
+        return None, error
+    diff_values = series["diff"]
+
+    # 一次遍历算出每天的zScore（第i天只使用前i个历史数据，不足2个或标准差为0时为NaN）和买卖条件
+    with profiling.stage("stats", stock['code']):
+        frame = signals.Frame({"c": series["close"], "diff": diff_values})
+        z_scores = frame.evaluate(signals.Z_SCORE)
+        held = signal_state(frame.evaluate(ENTRY), frame.evaluate(EXIT), WARMUP)
+
+    # 批量回测：由信号直接得到买卖点和交易流水
+    with profiling.stage("simulate", stock['code']):
+        ledger = simulate(z_scores, series["close"], series["dates"], diff_values, held=held)
+    if verbose:
+        with profiling.stage("render", stock['code']):
+            print_ledger(ledger)
+    profit = ledger["final_profit"]
     
     return profit, None  # 返回收益和无错误信息
 def main():
+    # 加 --profile 或 --profile=文件 时统计各阶段耗时和API请求
+    profiling.setup(sys.argv[1:])
     for stock in STOCK_LIST:
         result, error = analyze_stock(stock)
         print(f"{result} {error}")
+    print_usage()
+    profiling.report()
 
 if __name__ == "__main__":
     main()
\ No newline at end of file
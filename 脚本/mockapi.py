@@ -0,0 +1,314 @@
+"""
+麦蕊API的本地替身服务：回放录制的响应或生成合成序列，可注入延迟、错误和额度用完，用于离线测试和压测
+
+支持的地址与真实API一致（许可证任意）：
+    /hszbl/macd/<代码>/<周期>/<许可证>                 macd.py
+    /hsindex/history/macd/<代码>/<周期>/<许可证>       macdzs.py
+    /hsindex/history/<代码>/<周期>/<许可证>
+    /hsstock/history/<代码>/<周期>/<复权>/<许可证>       mockTrack.py
+    /hsstock/history/macd/<代码>/<周期>/<复权>/<许可证>  mockTrack.py、macdzsgui.py
+    /hslt/list/<许可证>                               screener.py
+以上均支持 ?st=YYYYMMDD&et=YYYYMMDD。
+
+用法：
+    python mockapi.py --port 8765 --bars 5000 --latency 0.05 --error-rate 0.02
+    MAIRUI_BASE_URL=http://127.0.0.1:8765 python macd.py
+
+    python mockapi.py --record recordings   转发到真实API并把响应保存到目录
+    python mockapi.py --replay recordings   有录制的地址返回录制内容，其余返回合成数据
+"""
+import argparse
+import json
+import os
+import random
+import re
+import threading
+import time
+import zlib
+from functools import lru_cache
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlsplit
+
+import numpy as np
+import requests
+
+from indicators import macd
+
+UPSTREAM = "https://api.mairuiapi.com"
+BARS = 2000            # 合成序列的默认长度
+UNIVERSE = 5000        # hslt/list 返回的股票数
+# 按长度从长到短匹配，hsstock/history/macd 优先于 hsstock/history
+ENDPOINTS = ("hsstock/history/macd", "hsindex/history/macd", "hsstock/history", "hsindex/history", "hszbl/macd", "hslt/list")
+MINUTE_SESSIONS = ((9 * 60 + 30, 11 * 60 + 30), (13 * 60, 15 * 60))  # 分钟K线的交易时段
+
+
+def parse_path(path):
+    """把请求路径拆成 (接口, 代码, 周期, 复权, 许可证)，无法识别时返回None"""
+    path = path.strip("/")
+    for endpoint in ENDPOINTS:
+        if not path.startswith(endpoint + "/"):
+            continue
+        parts = path[len(endpoint) + 1:].split("/")
+        if endpoint == "hslt/list" and len(parts) == 1:
+            return endpoint, None, None, None, parts[0]
+        if len(parts) == 3:
+            return endpoint, parts[0], parts[1], None, parts[2]
+        if len(parts) == 4:
+            return endpoint, parts[0], parts[1], parts[2], parts[3]
+    return None
+
+
+def _timestamps(period, bars, end):
+    """以end为最后一个交易日，往前生成bars个K线时间"""
+    end = np.datetime64(end, "D")
+    if period.isdigit():
+        step = int(period)
+        minutes = np.concatenate([np.arange(open_ + step, close + 1, step) for open_, close in MINUTE_SESSIONS])
+        days = _timestamps("d", -(-bars // len(minutes)), end).astype("datetime64[m]")
+        times = (days[:, None] + minutes[None, :].astype("timedelta64[m]")).ravel()
+        return times[-bars:].astype("datetime64[s]")
+    step = {"d": 1, "w": 5, "m": 21}.get(period, 1)
+    last = np.busday_offset(end, 0, roll="backward")
+    days = np.busday_offset(last, -step * np.arange(bars)[::-1])
+    return days.astype("datetime64[s]")
+
+
+@lru_cache(maxsize=64)
+def synthetic_bars(code, period="d", bars=BARS, end=None):
+    """
+    按代码生成确定性的K线和MACD（同一代码每次结果相同），返回按列存放的字典
+
+    收盘价为随机游走，MACD由indicators.macd计算，与真实接口的字段一致。
+    """
+    rng = np.random.default_rng(zlib.crc32(f"{code}/{period}".encode()))
+    close = np.round(10 * np.exp(np.cumsum(rng.normal(0.0002, 0.02, bars))), 2)
+    pre_close = np.concatenate(([close[0]], close[:-1]))
+    spread = np.abs(rng.normal(0, 0.01, bars)) * close
+    open_ = np.round(pre_close + rng.normal(0, 0.005, bars) * close, 2)
+    volume = np.round(rng.lognormal(12, 0.5, bars))
+    indicator = macd(close)
+    return {
+        "t": _timestamps(period, bars, end or np.datetime64("today")),
+        "o": open_,
+        "h": np.round(np.maximum(open_, close) + spread, 2),
+        "l": np.round(np.minimum(open_, close) - spread, 2),
+        "c": close,
+        "v": volume,
+        "a": np.round(volume * close * 100, 2),
+        "pc": pre_close,
+        "sf": np.zeros(bars),
+        "diff": indicator["diff"],
+        "dea": indicator["dea"],
+        "macd": indicator["macd"],
+        "ema12": indicator["ema_fast"],
+        "ema26": indicator["ema_slow"],
+    }
+
+
+def _fields(endpoint):
+    if endpoint.endswith("macd"):
+        return ("diff", "dea", "macd", "ema12", "ema26")
+    return ("o", "h", "l", "c", "v", "a", "pc", "sf")
+
+
+def synthetic_records(endpoint, code, period, bars=BARS, st=None, et=None):
+    """生成某个接口的合成响应（字典列表），按st/et（YYYYMMDD，含两端）截取"""
+    if endpoint == "hslt/list":
+        return [{"dm": f"{600000 + i:06d}.SH", "mc": f"合成{i}", "jys": "sh"} for i in range(UNIVERSE)]
+    columns = synthetic_bars(code, period, bars)
+    dates = columns["t"]
+    lo = np.searchsorted(dates, _day(st)) if st else 0
+    hi = np.searchsorted(dates, _day(et) + np.timedelta64(1, "D")) if et else len(dates)
+    # hszbl/macd 的日期不带时间，其余接口带 00:00:00
+    unit = "D" if endpoint == "hszbl/macd" and not period.isdigit() else "s"
+    times = np.datetime_as_string(dates[lo:hi], unit=unit)
+    if unit == "s":
+        times = np.char.replace(times, "T", " ")
+    names = _fields(endpoint)
+    values = [np.round(columns[name][lo:hi], 4).tolist() for name in names]
+    return [dict(zip(("t",) + names, row)) for row in zip(times.tolist(), *values)]
+
+
+def _day(value):
+    return np.datetime64(f"{value[:4]}-{value[4:6]}-{value[6:8]}", "s")
+
+
+def record_name(path, query=""):
+    """录制文件名：去掉许可证的路径加查询参数，例如 hszbl-macd_000001_d__st=20240101.json"""
+    parsed = parse_path(path)
+    parts = [parsed[0].replace("/", "-")] + [part for part in parsed[1:4] if part] if parsed else [path.strip("/")]
+    name = "_".join(parts)
+    if query:
+        name += "__" + query
+    return re.sub(r"[^\w.=-]", "_", name) + ".json"
+
+
+class MockAPI(ThreadingHTTPServer):
+    """
+    替身服务器，各项设置作为属性保存，处理请求的线程共享
+
+    latency/jitter：每个请求额外等待 latency±jitter 秒
+    error_rate：按此概率返回500；throttle_rate：按此概率返回429
+    quota：每个许可证最多成功请求的次数，超过后返回额度用完（0为不限）
+    replay_dir：回放录制的响应；record_dir：转发到upstream并保存响应
+    """
+
+    daemon_threads = True
+
+    def __init__(self, address, bars=BARS, latency=0.0, jitter=0.0, error_rate=0.0, throttle_rate=0.0,
+                 quota=0, replay_dir=None, record_dir=None, upstream=UPSTREAM, seed=None):
+        super().__init__(address, MockHandler)
+        self.bars = bars
+        self.latency = latency
+        self.jitter = jitter
+        self.error_rate = error_rate
+        self.throttle_rate = throttle_rate
+        self.quota = quota
+        self.replay_dir = replay_dir
+        self.record_dir = record_dir
+        self.upstream = upstream.rstrip("/")
+        self.random = random.Random(seed)
+        self.lock = threading.Lock()
+        self.requests = 0
+        self.used = {}  # {许可证: 成功次数}
+
+    @property
+    def base_url(self):
+        host, port = self.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def roll(self):
+        """决定本次请求的结果：返回 (延迟秒数, 状态码或None)"""
+        with self.lock:
+            self.requests += 1
+            delay = max(0.0, self.latency + self.random.uniform(-self.jitter, self.jitter))
+            draw = self.random.random()
+        if draw < self.error_rate:
+            return delay, 500
+        if draw < self.error_rate + self.throttle_rate:
+            return delay, 429
+        return delay, None
+
+    def charge(self, license):
+        """扣一次额度，额度用完时返回False"""
+        with self.lock:
+            used = self.used.get(license, 0)
+            if self.quota and used >= self.quota:
+                return False
+            self.used[license] = used + 1
+            return True
+
+
+class MockHandler(BaseHTTPRequestHandler):
+    server_version = "MairuiMock/1.0"
+
+    def log_message(self, format, *args):
+        pass
+
+    def _send(self, status, body, content_type="application/json; charset=utf-8", headers=()):
+        self.send_response(status)
+        self.send_header("Content-Type", content_type)
+        self.send_header("Content-Length", str(len(body)))
+        for name, value in headers:
+            self.send_header(name, value)
+        self.end_headers()
+        self.wfile.write(body)
+
+    def _send_json(self, data, status=200):
+        self._send(status, json.dumps(data, ensure_ascii=False).encode("utf-8"))
+
+    def do_GET(self):
+        server = self.server
+        url = urlsplit(self.path)
+        parsed = parse_path(url.path)
+        delay, status = server.roll()
+        if delay:
+            time.sleep(delay)
+        if parsed is None:
+            self._send_json({"error": f"未知接口 {url.path}"}, 404)
+            return
+        if status == 429:
+            self._send(429, b"Too Many Requests", "text/plain", [("Retry-After", "0.1")])
+            return
+        if status:
+            self._send(status, b"Internal Server Error", "text/plain")
+            return
+        endpoint, code, period, adjust, license = parsed
+        if not server.charge(license):
+            self._send_json({"error": "许可证调用次数已达上限"})
+            return
+
+        name = record_name(url.path, url.query)
+        if server.record_dir:
+            self._proxy(url, name)
+            return
+        if server.replay_dir:
+            path = os.path.join(server.replay_dir, name)
+            if os.path.exists(path):
+                with open(path, "rb") as f:
+                    self._send(200, f.read())
+                return
+        query = {key: values[0] for key, values in parse_qs(url.query).items()}
+        self._send(200, _encoded(endpoint, code, period, server.bars, query.get("st"), query.get("et")))
+
+    def _proxy(self, url, name):
+        """转发到真实API，成功时保存响应"""
+        server = self.server
+        target = server.upstream + url.path + ("?" + url.query if url.query else "")
+        try:
+            response = requests.get(target, timeout=30)
+        except requests.exceptions.RequestException as e:
+            self._send(502, str(e).encode("utf-8"), "text/plain")
+            return
+        if response.status_code == 200:
+            os.makedirs(server.record_dir, exist_ok=True)
+            with open(os.path.join(server.record_dir, name), "wb") as f:
+                f.write(response.content)
+        self._send(response.status_code, response.content,
+                   response.headers.get("Content-Type", "application/json; charset=utf-8"))
+
+
+@lru_cache(maxsize=8192)
+def _encoded(endpoint, code, period, bars, st, et):
+    """合成响应的JSON字节，同一请求重复压测时不再重复编码"""
+    return json.dumps(synthetic_records(endpoint, code, period, bars, st, et), ensure_ascii=False).encode("utf-8")
+
+
+def start(host="127.0.0.1", port=0, **options):
+    """在后台线程启动替身服务，返回服务器对象（server.base_url为地址，server.shutdown()停止）"""
+    server = MockAPI((host, port), **options)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+def main():
+    parser = argparse.ArgumentParser(description="麦蕊API本地替身服务")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--bars", type=int, default=BARS, help="合成序列的长度")
+    parser.add_argument("--latency", type=float, default=0.0, help="每个请求的延迟（秒）")
+    parser.add_argument("--jitter", type=float, default=0.0, help="延迟的随机波动（秒）")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="返回500的概率")
+    parser.add_argument("--throttle-rate", type=float, default=0.0, help="返回429的概率")
+    parser.add_argument("--quota", type=int, default=0, help="每个许可证的请求次数上限，0为不限")
+    parser.add_argument("--seed", type=int, default=None, help="延迟和错误注入的随机种子")
+    group = parser.add_mutually_exclusive_group()
+    group.add_argument("--replay", metavar="DIR", help="回放目录中录制的响应")
+    group.add_argument("--record", metavar="DIR", help="转发到真实API并录制响应")
+    args = parser.parse_args()
+
+    server = MockAPI((args.host, args.port), bars=args.bars, latency=args.latency, jitter=args.jitter,
+                     error_rate=args.error_rate, throttle_rate=args.throttle_rate, quota=args.quota,
+                     replay_dir=args.replay, record_dir=args.record, seed=args.seed)
+    print(f"替身服务已启动：{server.base_url}")
+    print(f"设置环境变量 MAIRUI_BASE_URL={server.base_url} 后运行各脚本")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+
+
+if __name__ == "__main__":
+    main()
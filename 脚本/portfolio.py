@@ -0,0 +1,208 @@
+"""组合回测：整个自选股列表共用一份资金，按持仓数量和单只权重上限分配，考虑整手、T+1和交易费用"""
+import argparse
+
+import numpy as np
+
+from backtest import BUY_THRESHOLD, INITIAL_CASH, SELL_THRESHOLD, WARMUP, holding_state, max_drawdown
+from bars import format_dates
+from mairui import print_usage
+from rolling import zscore_series
+from runner import add_list_argument, fetch_all, load_list
+from screener import align
+
+LOT = 100                 # A股每手100股
+COMMISSION = 0.00025      # 佣金费率（买卖双向）
+MIN_COMMISSION = 5.0      # 每笔最低佣金
+STAMP_TAX = 0.0005        # 印花税（仅卖出）
+MAX_POSITIONS = 10        # 同时最多持有的股票数
+MAX_WEIGHT = 0.2          # 单只股票买入时最多占总权益的比例
+
+
+def fees(amount, sell=False, commission=COMMISSION, min_commission=MIN_COMMISSION, stamp_tax=STAMP_TAX):
+    """成交金额对应的费用：佣金（有最低值）加卖出时的印花税，amount可以是数组"""
+    amount = np.asarray(amount, dtype=np.float64)
+    cost = np.where(amount > 0, np.maximum(amount * commission, min_commission), 0.0)
+    return cost + amount * stamp_tax if sell else cost
+
+
+def zscore_matrix(matrix, window=None):
+    """
+    对 日期×股票 矩阵逐列计算Z-score（第i天只用之前的数据，与mockTrack口径一致）
+
+    每列只用该股票有数据的日期计算，NaN（未上市、停牌）处结果也为NaN。
+    """
+    z_scores = np.full(matrix.shape, np.nan)
+    for column in range(matrix.shape[1]):
+        valid = ~np.isnan(matrix[:, column])
+        z_scores[valid, column] = zscore_series(matrix[valid, column], window=window, exclude_current=True)[0]
+    return z_scores
+
+
+def simulate_portfolio(z_scores, prices, buy_threshold=BUY_THRESHOLD, sell_threshold=SELL_THRESHOLD,
+                       warmup=WARMUP, initial_cash=INITIAL_CASH, max_positions=MAX_POSITIONS,
+                       max_weight=MAX_WEIGHT, lot=LOT, commission=COMMISSION,
+                       min_commission=MIN_COMMISSION, stamp_tax=STAMP_TAX):
+    """
+    共用资金的组合回测，z_scores和prices为对齐后的 日期×股票 矩阵（NaN表示当天无法交易）
+
+    每只股票的持仓信号与simulate相同（holding_state按列计算，warmup从该股票第一个有效数据点起算），
+    当天收盘价成交：先卖出信号转为空仓的股票，再按Z-score从高到低买入信号为持仓且未持有的股票，
+    每只买入金额不超过 总权益×max_weight，按整手取整，持仓数不超过max_positions，
+    现金不够买某一只时跳过它，继续看后面的。当天买入的股票当天不能卖出（T+1）。
+
+    返回字典：equity/cash/positions（逐日权益、现金、持仓数），trades（按成交顺序的流水，
+    列为index/column/side/price/shares/amount/fee），final_profit、fees、trade_count、shares（期末持股）。
+    """
+    z_scores = np.asarray(z_scores, dtype=np.float64)
+    prices = np.asarray(prices, dtype=np.float64)
+    n, k = prices.shape
+    tradable = ~np.isnan(prices)
+    # 预热期按每只股票自己的数据点数计算，与单只回测一致，不受对齐后其他股票上市早晚影响
+    own_bar = np.cumsum(tradable, axis=0) - 1
+    wanted = holding_state(np.where(own_bar >= warmup, z_scores, np.nan), buy_threshold, sell_threshold, 0)
+    # 停牌日按最近的收盘价估值
+    last_seen = np.maximum.accumulate(np.where(tradable, np.arange(n)[:, None], 0), axis=0)
+    marks = np.nan_to_num(np.take_along_axis(prices, last_seen, axis=0))
+
+    shares = np.zeros(k)
+    bought_on = np.full(k, -1)
+    cash = float(initial_cash)
+    equity = np.empty(n)
+    cash_curve = np.empty(n)
+    positions = np.empty(n, dtype=np.int64)
+    trades = []
+    total_fees = 0.0
+
+    for t in range(n):
+        price = prices[t]
+        held = shares > 0
+
+        # 卖出：信号转为空仓、当天可交易、不是当天买入的
+        sell = np.flatnonzero(held & ~wanted[t] & tradable[t] & (bought_on < t))
+        if len(sell):
+            amount = shares[sell] * price[sell]
+            fee = fees(amount, True, commission, min_commission, stamp_tax)
+            cash += float(np.sum(amount - fee))
+            total_fees += float(np.sum(fee))
+            trades.append((t, sell, -1, price[sell], shares[sell], amount, fee))
+            shares[sell] = 0
+            held[sell] = False
+
+        # 买入：按Z-score从高到低，受持仓数、单只权重和现金限制
+        slots = max_positions - int(held.sum())
+        candidates = np.flatnonzero(~held & wanted[t] & tradable[t])
+        if slots > 0 and len(candidates):
+            candidates = candidates[np.argsort(-z_scores[t, candidates], kind="stable")]
+            budget = (cash + float(shares @ marks[t])) * max_weight
+            lots = np.floor(budget / (price[candidates] * lot * (1 + commission)))
+            amount = lots * lot * price[candidates]
+            cost = amount + fees(amount, False, commission, min_commission, stamp_tax)
+            # 依次买入，剩余现金不够的跳过，直到持仓数达到上限
+            affordable = np.zeros(len(candidates), dtype=bool)
+            remaining = cash
+            for i in np.flatnonzero(lots > 0):
+                if cost[i] <= remaining:
+                    affordable[i] = True
+                    remaining -= cost[i]
+                    slots -= 1
+                    if slots == 0:
+                        break
+            buy = candidates[affordable]
+            if len(buy):
+                amount, cost = amount[affordable], cost[affordable]
+                cash -= float(np.sum(cost))
+                total_fees += float(np.sum(cost - amount))
+                shares[buy] = lots[affordable] * lot
+                bought_on[buy] = t
+                trades.append((t, buy, 1, price[buy], shares[buy], amount, cost - amount))
+
+        cash_curve[t] = cash
+        equity[t] = cash + float(shares @ marks[t])
+        positions[t] = int(np.count_nonzero(shares))
+
+    return {
+        "equity": equity,
+        "cash": cash_curve,
+        "positions": positions,
+        "trades": _ledger(trades),
+        "shares": shares,
+        "final_profit": float(equity[-1] - initial_cash) if n else 0.0,
+        "fees": total_fees,
+        "trade_count": sum(len(columns) for _, columns, side, *_ in trades if side > 0),
+    }
+
+
+def _ledger(trades):
+    """把每天的成交数组拼成按列存放的流水"""
+    names = ("index", "column", "side", "price", "shares", "amount", "fee")
+    if not trades:
+        return {name: np.empty(0) for name in names}
+    return {
+        "index": np.concatenate([np.full(len(columns), t) for t, columns, *_ in trades]),
+        "column": np.concatenate([columns for _, columns, *_ in trades]),
+        "side": np.concatenate([np.full(len(columns), side, dtype=np.int8) for _, columns, side, *_ in trades]),
+        "price": np.concatenate([item[3] for item in trades]),
+        "shares": np.concatenate([item[4] for item in trades]),
+        "amount": np.concatenate([item[5] for item in trades]),
+        "fee": np.concatenate([item[6] for item in trades]),
+    }
+
+
+def load_matrices(stocks, market="hsstock", io_workers=8, window=None):
+    """获取所有股票的收盘价和DIF并对齐，返回 (日期, Z-score矩阵, 价格矩阵, 错误列表)"""
+    fetched = fetch_all(stocks, market, io_workers)
+    histories = [{"t": series["dates"], "c": series["close"], "diff": series["diff"]} if series else None
+                 for series, _ in fetched]
+    dates, diff = align(histories, "diff")
+    _, prices = align(histories, "c")
+    return dates, zscore_matrix(diff, window), prices, [error for _, error in fetched]
+
+
+def print_portfolio(stocks, dates, result, trades=False):
+    """打印组合回测汇总，trades为True时同时打印成交流水"""
+    ledger = result["trades"]
+    if trades:
+        print("="*80)
+        print(f"{'日期':<10} {'股票代码':<10} {'操作':<6} {'价格':<10} {'股数':<10} {'成交金额':<14} {'费用':<10}")
+        print("-"*80)
+        for date, column, side, price, count, amount, fee in zip(
+                format_dates(dates[ledger["index"].astype(np.int64)]), ledger["column"], ledger["side"],
+                ledger["price"], ledger["shares"], ledger["amount"], ledger["fee"]):
+            action = "买入" if side > 0 else "卖出"
+            print(f"{date}  {stocks[column]['code']:<12} {action}   {price:<10.2f} {count:<10.0f} {amount:<14.2f} {fee:<10.2f}")
+    equity = result["equity"]
+    print("="*80)
+    print(f"回测区间: {format_dates(dates[:1])[0] if len(dates) else 'N/A'} - {format_dates(dates[-1:])[0] if len(dates) else 'N/A'}")
+    print(f"最终收益: {result['final_profit']:.2f} 元")
+    print(f"最大回撤: {max_drawdown(equity):.2%}")
+    print(f"买入次数: {result['trade_count']}  交易费用: {result['fees']:.2f} 元")
+    print(f"平均持仓数: {result['positions'].mean() if len(equity) else 0:.2f}")
+    held = np.flatnonzero(result["shares"] > 0)
+    print(f"期末持仓: {' '.join(stocks[i]['code'] for i in held) or '无'}")
+    print("="*80)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="共用资金的组合回测")
+    add_list_argument(parser)
+    parser.add_argument("--cash", type=float, default=INITIAL_CASH, help="初始资金")
+    parser.add_argument("--max-positions", type=int, default=MAX_POSITIONS, help="最多同时持有的股票数")
+    parser.add_argument("--max-weight", type=float, default=MAX_WEIGHT, help="单只股票买入时占总权益的上限")
+    parser.add_argument("--commission", type=float, default=COMMISSION, help="佣金费率")
+    parser.add_argument("--trades", action="store_true", help="打印成交流水")
+    args = parser.parse_args()
+
+    stocks, market = load_list(args.list)
+
+    dates, z_scores, prices, errors = load_matrices(stocks, market)
+    for stock, error in zip(stocks, errors):
+        if error:
+            print(f"{stock['code']} {stock['name']} {error}")
+    result = simulate_portfolio(z_scores, prices, initial_cash=args.cash, max_positions=args.max_positions,
+                                max_weight=args.max_weight, commission=args.commission)
+    print_portfolio(stocks, dates, result, args.trades)
+    print_usage()
+
+
+if __name__ == "__main__":
+    main()
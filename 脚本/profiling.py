@@ -0,0 +1,199 @@
+"""
+分阶段计时和API请求统计：命令行加 --profile 时记录每个阶段的耗时、每次请求的延迟、字节数和行数
+
+    python macd.py --profile              结束时打印汇总
+    python macd.py --profile=prof.json    汇总和明细写入JSON文件（.csv结尾时写明细CSV）
+
+未开启时stage()返回同一个空的上下文对象，记录函数只检查一次ENABLED，几乎没有额外开销。
+"""
+import csv
+import json
+import os
+import threading
+import time
+from collections import defaultdict
+
+import numpy as np
+
+ENABLED = False
+OUTPUT = None          # 汇总写入的文件，None时打印到控制台
+
+_lock = threading.Lock()
+_stages = []           # (阶段, 代码, 开始时间, 耗时, 行数)
+_requests = []         # (接口, 状态码, 延迟, 解码耗时, 字节数, 行数)
+_origin = time.perf_counter()
+
+
+class _Stage:
+    """一个计时中的阶段，with块内可以设置rows（处理的行数）"""
+
+    __slots__ = ("name", "code", "rows", "start")
+
+    def __init__(self, name, code):
+        self.name = name
+        self.code = code
+        self.rows = None
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        elapsed = time.perf_counter() - self.start
+        with _lock:
+            _stages.append((self.name, self.code, self.start - _origin, elapsed, self.rows))
+        return False
+
+
+class _NullStage:
+    """未开启时使用的空阶段，设置rows也不记录"""
+
+    rows = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+    def __setattr__(self, name, value):
+        pass
+
+
+_NULL = _NullStage()
+
+
+def stage(name, code=None):
+    """计时一个阶段：with stage("filter", code) as s: ...; s.rows = n"""
+    if not ENABLED:
+        return _NULL
+    return _Stage(name, code)
+
+
+def record_request(url, status, latency, decode, size, rows):
+    """记录一次API请求（由mairui在ENABLED时调用）"""
+    with _lock:
+        _requests.append((endpoint_of(url), status, latency, decode, size, rows))
+
+
+def endpoint_of(url):
+    """URL中接口部分，例如 hsstock/history/macd（去掉地址、代码、周期和许可证）"""
+    path = url.split("://", 1)[-1].split("?", 1)[0].split("/")[1:]
+    parts = []
+    for part in path:
+        if part[:1].isdigit() or len(part) <= 1:
+            break
+        parts.append(part)
+    return "/".join(parts)
+
+
+def enable(output=None):
+    global ENABLED, OUTPUT
+    ENABLED = True
+    OUTPUT = output
+
+
+def setup(argv):
+    """从命令行参数中取出 --profile 或 --profile=文件 并开启，返回去掉该参数后的列表"""
+    rest = []
+    for arg in argv:
+        if arg == "--profile":
+            enable()
+        elif arg.startswith("--profile="):
+            enable(arg.split("=", 1)[1])
+        else:
+            rest.append(arg)
+    return rest
+
+
+def reset():
+    with _lock:
+        _stages.clear()
+        _requests.clear()
+
+
+def _describe(values):
+    values = np.asarray(values, dtype=np.float64)
+    if len(values) == 0:
+        return {"count": 0}
+    return {
+        "count": len(values),
+        "total": float(values.sum()),
+        "mean": float(values.mean()),
+        "p50": float(np.percentile(values, 50)),
+        "p95": float(np.percentile(values, 95)),
+        "max": float(values.max()),
+    }
+
+
+def summary():
+    """按阶段和接口汇总，返回字典（时间单位为秒）"""
+    with _lock:
+        stages, requests = list(_stages), list(_requests)
+    by_stage = defaultdict(list)
+    rows = defaultdict(int)
+    for name, _, _, elapsed, count in stages:
+        by_stage[name].append(elapsed)
+        rows[name] += count or 0
+    by_endpoint = defaultdict(list)
+    for request in requests:
+        by_endpoint[request[0]].append(request)
+    return {
+        "stages": {name: {**_describe(times), "rows": rows[name]} for name, times in by_stage.items()},
+        "requests": {
+            endpoint: {
+                "latency": _describe([r[2] for r in items]),
+                "decode": _describe([r[3] for r in items]),
+                "bytes": sum(r[4] for r in items),
+                "rows": sum(r[5] for r in items),
+                "errors": sum(1 for r in items if r[1] != 200),
+            }
+            for endpoint, items in by_endpoint.items()
+        },
+    }
+
+
+def print_summary(result=None):
+    result = result or summary()
+    print("="*80)
+    print(f"{'阶段':<16} {'次数':>6} {'总耗时(ms)':>12} {'平均(ms)':>10} {'P95(ms)':>10} {'最大(ms)':>10} {'行数':>10}")
+    print("-"*80)
+    for name, item in result["stages"].items():
+        print(f"{name:<18} {item['count']:>8} {item['total'] * 1e3:>14.2f} {item['mean'] * 1e3:>12.2f} "
+              f"{item['p95'] * 1e3:>11.2f} {item['max'] * 1e3:>12.2f} {item['rows']:>12}")
+    for endpoint, item in result["requests"].items():
+        latency, decode = item["latency"], item["decode"]
+        print("-"*80)
+        print(f"接口 {endpoint}: {latency['count']}次 失败{item['errors']}次 {item['bytes'] / 1024:.1f}KB {item['rows']}行")
+        print(f"  延迟 平均{latency['mean'] * 1e3:.1f}ms P50 {latency['p50'] * 1e3:.1f}ms "
+              f"P95 {latency['p95'] * 1e3:.1f}ms 最大{latency['max'] * 1e3:.1f}ms  "
+              f"JSON解码共{decode['total'] * 1e3:.1f}ms")
+    print("="*80)
+
+
+def report():
+    """开启时输出结果：有OUTPUT时写文件（.csv为明细，其余为JSON汇总加明细），否则打印汇总"""
+    if not ENABLED:
+        return
+    if not OUTPUT:
+        print_summary()
+        return
+    with _lock:
+        stages, requests = list(_stages), list(_requests)
+    if os.path.splitext(OUTPUT)[1].lower() == ".csv":
+        with open(OUTPUT, "w", newline="", encoding="utf-8-sig") as f:
+            writer = csv.writer(f)
+            writer.writerow(["kind", "name", "code", "start", "seconds", "decode", "status", "bytes", "rows"])
+            for name, code, start, elapsed, rows in stages:
+                writer.writerow(["stage", name, code or "", f"{start:.6f}", f"{elapsed:.6f}", "", "", "", rows or ""])
+            for endpoint, status, latency, decode, size, rows in requests:
+                writer.writerow(["request", endpoint, "", "", f"{latency:.6f}", f"{decode:.6f}", status, size, rows])
+    else:
+        with open(OUTPUT, "w", encoding="utf-8") as f:
+            json.dump({
+                "summary": summary(),
+                "stages": [dict(zip(("name", "code", "start", "seconds", "rows"), item)) for item in stages],
+                "requests": [dict(zip(("endpoint", "status", "latency", "decode", "bytes", "rows"), item))
+                             for item in requests],
+            }, f, ensure_ascii=False, indent=1)
+    print(f"性能统计已写入 {OUTPUT}")
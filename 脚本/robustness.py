@@ -0,0 +1,142 @@
+"""
+稳健性分析：对策略的逐日收益或逐笔收益做自助重抽样（bootstrap）/打乱顺序，
+一次生成上万条路径组成的二维数组，统计最终收益、最大回撤和胜率的分布
+
+    python robustness.py                    mockTrack自选股，逐日收益分块重抽样10000次
+    python robustness.py --method shuffle --source trades 600036
+"""
+import argparse
+
+import numpy as np
+
+from backtest import INITIAL_CASH, simulate
+from mairui import print_usage
+from rolling import zscore_series
+
+PATHS = 10000
+BLOCK = 20                 # 分块重抽样的块长度（交易日），保留收益的短期相关性
+PERCENTILES = (5, 25, 50, 75, 95)
+CHUNK_ELEMENTS = 8_000_000  # 每次计算最多的路径元素数（约64MB的float64）
+METHODS = ("block", "iid", "shuffle")
+
+
+def daily_returns(equity):
+    """逐日权益转换成逐日收益率"""
+    equity = np.asarray(equity, dtype=np.float64)
+    return equity[1:] / equity[:-1] - 1.0 if len(equity) > 1 else np.empty(0)
+
+
+def trade_returns(ledger):
+    """交易流水中每笔交易的收益率（卖出价/买入价-1）"""
+    prices = np.asarray(ledger["price"], dtype=np.float64)
+    return prices[1::2] / prices[0::2] - 1.0
+
+
+def resample_indices(n, paths, method="block", block=BLOCK, rng=None):
+    """
+    生成 (paths, n) 的下标矩阵
+
+    block：随机选起点、每次连续取block个（循环到开头），拼到n个为止；
+    iid：每个位置独立有放回抽样；shuffle：每条路径是一个随机排列（不放回，只改变顺序）。
+    """
+    rng = rng if rng is not None else np.random.default_rng()
+    if method == "iid":
+        return rng.integers(0, n, size=(paths, n))
+    if method == "shuffle":
+        return np.argsort(rng.random((paths, n)), axis=1)
+    if method != "block":
+        raise ValueError(f"未知的重抽样方法: {method}")
+    block = max(1, min(block, n))
+    blocks = -(-n // block)
+    starts = rng.integers(0, n, size=(paths, blocks, 1))
+    return ((starts + np.arange(block)) % n).reshape(paths, -1)[:, :n]
+
+
+def evaluate(returns, initial_cash=INITIAL_CASH):
+    """
+    对 (路径数, 期数) 的收益率矩阵逐行计算最终收益、最大回撤和胜率（收益不为0的期数中为正的比例）
+    """
+    growth = np.cumsum(np.log1p(returns), axis=1)
+    final_profit = initial_cash * np.expm1(growth[:, -1]) if returns.shape[1] else np.zeros(len(returns))
+    peak = np.maximum.accumulate(np.maximum(growth, 0.0), axis=1)
+    max_drawdown = -np.expm1(np.min(growth - peak, axis=1, initial=0.0))
+    active = np.count_nonzero(returns, axis=1)
+    with np.errstate(invalid="ignore", divide="ignore"):
+        win_rate = np.count_nonzero(returns > 0, axis=1) / active
+    return {"final_profit": final_profit, "max_drawdown": max_drawdown, "win_rate": win_rate}
+
+
+def bootstrap(returns, paths=PATHS, method="block", block=BLOCK, seed=None, initial_cash=INITIAL_CASH):
+    """
+    重抽样paths条路径并计算指标，返回 {指标: 长度为paths的数组}
+
+    路径按分块处理，每块一次性生成下标矩阵并整体计算，内存占用不超过CHUNK_ELEMENTS个元素。
+    """
+    returns = np.asarray(returns, dtype=np.float64)
+    n = len(returns)
+    rng = np.random.default_rng(seed)
+    chunk = max(1, CHUNK_ELEMENTS // max(n, 1))
+    parts = []
+    for start in range(0, paths, chunk):
+        count = min(chunk, paths - start)
+        indices = resample_indices(n, count, method, block, rng) if n else np.empty((count, 0), dtype=np.int64)
+        parts.append(evaluate(returns[indices], initial_cash))
+    return {name: np.concatenate([part[name] for part in parts]) for name in ("final_profit", "max_drawdown", "win_rate")}
+
+
+def summarize(metrics, percentiles=PERCENTILES):
+    """各指标的分位数，以及亏损的概率"""
+    summary = {name: dict(zip(percentiles, np.nanpercentile(values, percentiles))) for name, values in metrics.items()}
+    summary["loss_probability"] = float(np.mean(metrics["final_profit"] < 0))
+    return summary
+
+
+def print_robustness(code, original, summary, paths, method):
+    """打印原始结果和重抽样分布"""
+    print("="*80)
+    print(f"{code}  {method} 重抽样 {paths} 次")
+    print(f"{'指标':<10} {'原始':>14} " + " ".join(f"{f'P{p}':>14}" for p in summary["final_profit"]))
+    print("-"*80)
+    for name, title, fmt in (("final_profit", "最终收益", "{:>14.2f}"), ("max_drawdown", "最大回撤", "{:>14.2%}"),
+                             ("win_rate", "胜率", "{:>14.2%}")):
+        print(f"{title:<10} {fmt.format(original[name])} " + " ".join(fmt.format(v) for v in summary[name].values()))
+    print(f"亏损概率: {summary['loss_probability']:.2%}")
+
+
+def main():
+    import mockTrack
+
+    parser = argparse.ArgumentParser(description="策略收益的重抽样稳健性分析")
+    parser.add_argument("codes", nargs="*", help="股票代码，默认mockTrack.STOCK_LIST")
+    parser.add_argument("--paths", type=int, default=PATHS, help="重抽样路径数")
+    parser.add_argument("--method", choices=METHODS, default="block", help="重抽样方法")
+    parser.add_argument("--block", type=int, default=BLOCK, help="分块重抽样的块长度")
+    parser.add_argument("--source", choices=["daily", "trades"], default="daily", help="使用逐日收益还是逐笔收益")
+    parser.add_argument("--seed", type=int, default=None, help="随机种子")
+    args = parser.parse_args()
+
+    codes = args.codes or [stock["code"] for stock in mockTrack.STOCK_LIST]
+    for code in codes:
+        series, error = mockTrack.load_series({"code": code, "name": code})
+        if error:
+            print(f"{code} {error}")
+            continue
+        z_scores, _, _ = zscore_series(series["diff"], exclude_current=True)
+        ledger = simulate(z_scores, series["close"], series["dates"], series["diff"])
+        # 没有交易时逐日收益全为0，胜率等指标没有意义，两种来源都跳过
+        if ledger["trade_count"] == 0:
+            print(f"{code} 没有交易，无法分析")
+            continue
+        returns = daily_returns(ledger["equity"]) if args.source == "daily" else trade_returns(ledger)
+        if len(returns) == 0:
+            print(f"{code} 数据不足，无法分析")
+            continue
+        original = {name: values[0] for name, values in evaluate(returns[None, :]).items()}
+        metrics = bootstrap(returns, args.paths, args.method, args.block, args.seed)
+        print_robustness(code, original, summarize(metrics), args.paths, args.method)
+    print("="*80)
+    print_usage()
+
+
+if __name__ == "__main__":
+    main()
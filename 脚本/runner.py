@@ -0,0 +1,128 @@
+"""多股票批量回测：先用线程并发拉取数据，再用进程池并行模拟交易"""
+import argparse
+import os
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+
+import mockTrack
+from backtest import BUY_THRESHOLD, SELL_THRESHOLD, WARMUP, max_drawdown, print_ledger, simulate
+from mairui import map_concurrent, print_usage
+from rolling import zscore_series
+
+DEFAULT_PARAMS = {
+    "buy_threshold": BUY_THRESHOLD,
+    "sell_threshold": SELL_THRESHOLD,
+    "warmup": WARMUP,
+    "window": None,
+}
+LISTS = ("mock", "macd", "macdzs")   # --list可选的STOCK_LIST来源脚本
+
+
+def add_list_argument(parser, default="macd"):
+    """给命令行加上 --list 参数，取值见LISTS"""
+    parser.add_argument("--list", choices=LISTS, default=default,
+                        help="使用哪个脚本中的STOCK_LIST（macdzs为指数列表）")
+
+
+def load_list(name):
+    """按 --list 的取值返回 (STOCK_LIST, market)"""
+    if name == "macd":
+        import macd
+        return macd.STOCK_LIST, "hsstock"
+    if name == "macdzs":
+        import macdzs
+        return macdzs.STOCK_LIST, "hsindex"
+    if name == "mock":
+        return mockTrack.STOCK_LIST, "hsstock"
+    raise ValueError(f"未知的股票列表: {name}")
+
+
+def fetch_all(stocks, market="hsstock", io_workers=8):
+    """并发获取所有股票的序列，返回与stocks同序的 (series, error) 列表"""
+    return map_concurrent(lambda stock: mockTrack.load_series(stock, market), stocks, io_workers)
+
+
+def backtest_series(series, params):
+    """对已获取的序列做一次回测（在子进程中运行，只做计算不做网络请求）"""
+    z_scores, _, _ = zscore_series(series["diff"], window=params["window"], exclude_current=True)
+    return simulate(z_scores, series["close"], series["dates"], series["diff"],
+                    buy_threshold=params["buy_threshold"],
+                    sell_threshold=params["sell_threshold"],
+                    warmup=params["warmup"])
+
+
+def run_batch(stocks, market="hsstock", workers=None, io_workers=8, params=None):
+    """
+    批量回测一组股票
+
+    workers为进程数（默认CPU核数），io_workers为并发请求数。单支股票获取或回测失败
+    只记录在结果的error字段中，不影响其他股票。
+    返回 (results, ledgers)：results为每支股票一行的汇总字典列表，ledgers为 {代码: 交易流水}。
+    """
+    params = {**DEFAULT_PARAMS, **(params or {})}
+    fetched = fetch_all(stocks, market, io_workers)
+
+    results = []
+    ledgers = {}
+    with ProcessPoolExecutor(max_workers=workers or os.cpu_count()) as pool:
+        futures = [pool.submit(backtest_series, series, params) if series is not None else None
+                   for series, _ in fetched]
+        for stock, (series, error), future in zip(stocks, fetched, futures):
+            row = {"code": stock["code"], "name": stock["name"], "final_profit": None,
+                   "trade_count": None, "max_drawdown": None, "bars": 0, "error": error}
+            if future is not None:
+                row["bars"] = len(series["close"])
+                try:
+                    ledger = future.result()
+                except Exception as e:
+                    row["error"] = f"回测失败: {str(e)}"
+                else:
+                    ledgers[stock["code"]] = ledger
+                    row["final_profit"] = ledger["final_profit"]
+                    row["trade_count"] = ledger["trade_count"]
+                    row["max_drawdown"] = max_drawdown(ledger["equity"])
+            results.append(row)
+    return results, ledgers
+
+
+def print_results(results):
+    """打印汇总表"""
+    print("="*80)
+    print(f"{'股票代码':<10} {'股票名称':<8} {'数据点数':<8} {'最终收益':<14} {'交易次数':<8} {'最大回撤':<8}")
+    print("-"*80)
+    for row in results:
+        if row["error"]:
+            print(f"{row['code']:<14} {row['name']:<8} {'N/A':<12} {'N/A':<18} {'N/A':<12} {'N/A':<10} {row['error']}")
+        else:
+            print(f"{row['code']:<14} {row['name']:<8} {row['bars']:<12} {row['final_profit']:<18.2f} "
+                  f"{row['trade_count']:<12} {row['max_drawdown']:<10.2%}")
+    profits = [row["final_profit"] for row in results if not row["error"]]
+    print("-"*80)
+    if profits:
+        print(f"成功 {len(profits)}/{len(results)} 支，平均收益: {np.mean(profits):.2f} 元，"
+              f"盈利 {sum(p > 0 for p in profits)} 支")
+    print("="*80)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="多股票批量回测")
+    add_list_argument(parser)
+    parser.add_argument("--workers", type=int, default=None, help="回测进程数，默认CPU核数")
+    parser.add_argument("--io-workers", type=int, default=8, help="并发请求数")
+    parser.add_argument("--ledgers", action="store_true", help="同时打印每支股票的交易流水")
+    args = parser.parse_args()
+
+    stocks, market = load_list(args.list)
+
+    results, ledgers = run_batch(stocks, market, args.workers, args.io_workers)
+    if args.ledgers:
+        for code, ledger in ledgers.items():
+            print(code)
+            print_ledger(ledger)
+    print_results(results)
+    print_usage()
+
+
+if __name__ == "__main__":
+    main()
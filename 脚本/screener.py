@@ -0,0 +1,144 @@
+"""全市场选股扫描：把各股票的DIF对齐成 日期×股票 矩阵，一次算出所有股票的Z-score并排名"""
+import argparse
+from datetime import datetime, timedelta
+
+import numpy as np
+
+from barcache import get_bars
+from bars import select
+from mairui import BASE_URL, fetch_json, map_concurrent
+
+
+def load_universe(license):
+    """获取沪深A股全部股票列表（hslt/list接口），返回 (股票列表, 错误信息)"""
+    data, error = fetch_json(f"{BASE_URL}/hslt/list/{license}")
+    if error:
+        return None, error
+    return [{"code": item["dm"].split(".")[0], "name": item["mc"]} for item in data], None
+
+
+def load_histories(stocks, license, endpoint="hszbl/macd", start=None, concurrency=16):
+    """
+    并发读取每支股票的DIF序列（优先本地缓存），只保留start之后的数据
+
+    返回与stocks同序的 (列字典, 错误信息) 列表。
+    """
+    def load(stock):
+        bars, error = get_bars(endpoint, stock["code"], "d", license)
+        if error:
+            return None, error
+        return select(bars, start), None
+
+    return map_concurrent(load, stocks, concurrency)
+
+
+def align(histories, field="diff"):
+    """
+    把各股票的序列按日期对齐成矩阵，返回 (日期数组, 矩阵)
+
+    矩阵形状为 (日期数, 股票数)，某股票当天没有数据（未上市、停牌、获取失败）时为NaN。
+    """
+    valid = [bars for bars in histories if bars]
+    dates = np.unique(np.concatenate([bars["t"] for bars in valid])) if valid else np.array([], dtype="datetime64[s]")
+    matrix = np.full((len(dates), len(histories)), np.nan)
+    for column, bars in enumerate(histories):
+        if bars:
+            matrix[np.searchsorted(dates, bars["t"]), column] = bars[field]
+    return dates, matrix
+
+
+def screen(dates, matrix, asof=None, days=365, min_points=2):
+    """
+    对矩阵中的每支股票计算截至asof（默认最后一天）过去days天窗口的Z-score
+
+    口径与macd.py一致：均值、标准差包含当天，推荐买入为均值+标准差，推荐卖出为均值-标准差。
+    返回按列存放的结果字典（current_diff/mean/std/z_score/buy_diff/sell_diff/count/rank），
+    rank为按Z-score从高到低的名次（1开始），数据不足的股票Z-score为NaN且不参与排名。
+    """
+    if asof is not None:
+        end = np.searchsorted(dates, np.datetime64(asof, "s") + np.timedelta64(1, "D"))
+        dates, matrix = dates[:end], matrix[:end]
+    if len(dates):
+        anchor = np.datetime64(asof, "s") if asof is not None else dates[-1]
+        start = np.searchsorted(dates, anchor - np.timedelta64(days, "D"))
+        dates, matrix = dates[start:], matrix[start:]
+
+    present = ~np.isnan(matrix)
+    count = present.sum(axis=0)
+    # 每支股票最后一个有效值
+    last_row = len(matrix) - 1 - np.argmax(present[::-1], axis=0) if len(matrix) else np.zeros(matrix.shape[1], dtype=int)
+    current = matrix[last_row, np.arange(matrix.shape[1])] if len(matrix) else np.full(matrix.shape[1], np.nan)
+
+    with np.errstate(invalid="ignore", divide="ignore"):
+        safe = np.where(present, matrix, 0.0)
+        mean = safe.sum(axis=0) / count
+        std = np.sqrt((np.where(present, matrix - mean, 0.0) ** 2).sum(axis=0) / count)
+        z_score = (current - mean) / std
+    z_score[(count < min_points) | ~(std > 0)] = np.nan
+
+    order = np.argsort(np.where(np.isnan(z_score), np.inf, -z_score), kind="stable")
+    rank = np.zeros(len(z_score), dtype=np.int64)
+    ranked = order[~np.isnan(z_score[order])]
+    rank[ranked] = np.arange(1, len(ranked) + 1)
+    return {
+        "current_diff": current,
+        "mean": mean,
+        "std": std,
+        "z_score": z_score,
+        "buy_diff": mean + std,
+        "sell_diff": mean - std,
+        "count": count,
+        "rank": rank,
+    }
+
+
+def print_screen(stocks, result, top=20):
+    """打印Z-score最高和最低的top支股票"""
+    ranked = np.flatnonzero(result["rank"] > 0)
+    ranked = ranked[np.argsort(result["rank"][ranked])]
+    header = f"{'排名':<6} {'股票代码':<10} {'股票名称':<8} {'当前DIF':<10} {'Z-score':<8} {'推荐买入':<10} {'推荐卖出':<10}"
+    for title, rows in (("Z-score最高", ranked[:top]), ("Z-score最低", ranked[::-1][:top])):
+        print("="*80)
+        print(f"{title} {len(rows)} 支")
+        print(header)
+        print("-"*80)
+        for i in rows:
+            print(f"{result['rank'][i]:<8} {stocks[i]['code']:<14} {stocks[i]['name']:<8} {result['current_diff'][i]:<12.2f} "
+                  f"{result['z_score'][i]:<10.2f} {result['buy_diff'][i]:<12.2f} {result['sell_diff'][i]:<12.2f}")
+    print("="*80)
+    print(f"共 {len(stocks)} 支，有效 {len(ranked)} 支")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="全市场MACD DIF Z-score扫描")
+    parser.add_argument("--list", choices=["macd", "macdzs", "all"], default="macd",
+                        help="扫描范围：macd.py自选股、macdzs.py指数或全部A股")
+    parser.add_argument("--days", type=int, default=365, help="统计窗口天数")
+    parser.add_argument("--top", type=int, default=20, help="显示前后多少支")
+    parser.add_argument("--asof", default=None, help="分析日期 YYYY-MM-DD，默认最新")
+    args = parser.parse_args()
+
+    import macd
+    license, endpoint = macd.LICENSE, "hszbl/macd"
+    if args.list == "macdzs":
+        import macdzs
+        stocks, license, endpoint = macdzs.STOCK_LIST, macdzs.LICENSE, "hsindex/history/macd"
+    elif args.list == "all":
+        stocks, error = load_universe(license)
+        if error:
+            print(error)
+            return
+    else:
+        stocks = macd.STOCK_LIST
+
+    asof = datetime.strptime(args.asof, "%Y-%m-%d") if args.asof else datetime.now()
+    loaded = load_histories(stocks, license, endpoint, start=asof - timedelta(days=args.days + 1))
+    for stock, (_, error) in zip(stocks, loaded):
+        if error:
+            print(f"{stock['code']} {stock['name']} {error}")
+    dates, matrix = align([bars for bars, _ in loaded])
+    print_screen(stocks, screen(dates, matrix, asof, args.days), args.top)
+
+
+if __name__ == "__main__":
+    main()
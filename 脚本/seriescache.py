@@ -0,0 +1,83 @@
+"""进程内的序列缓存：按键保存解析好的数据，超过容量时淘汰最久未使用的条目"""
+import threading
+import time
+from collections import OrderedDict
+
+
+class _Load:
+    """正在进行中的一次加载，相同键的其他线程等待它的结果"""
+
+    def __init__(self):
+        self.done = threading.Event()
+        self.result = (None, "加载中断")
+
+
+class SeriesCache:
+    """线程安全的LRU缓存，ttl秒后条目过期（ttl为None时不过期）"""
+
+    def __init__(self, maxsize=64, ttl=None):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._lock = threading.Lock()
+        self._items = OrderedDict()
+        self._loading = {}
+        self.hits = 0
+        self.misses = 0
+        self.coalesced = 0
+
+    def get(self, key):
+        """取出缓存的值，不存在或已过期时返回None"""
+        with self._lock:
+            item = self._items.get(key)
+            if item is None or (self.ttl is not None and time.time() - item[1] > self.ttl):
+                self._items.pop(key, None)
+                self.misses += 1
+                return None
+            self._items.move_to_end(key)
+            self.hits += 1
+            return item[0]
+
+    def put(self, key, value):
+        with self._lock:
+            self._items[key] = (value, time.time())
+            self._items.move_to_end(key)
+            while len(self._items) > self.maxsize:
+                self._items.popitem(last=False)
+
+    def get_or_load(self, key, loader):
+        """
+        缓存命中直接返回 (值, None)，否则调用loader()得到 (值, 错误信息)，成功时写入缓存
+
+        同一个键同时只加载一次，其余线程等待并共享结果（包括错误）。
+        """
+        value = self.get(key)
+        if value is not None:
+            return value, None
+        with self._lock:
+            load = self._loading.get(key)
+            leader = load is None
+            if leader:
+                load = self._loading[key] = _Load()
+            else:
+                self.coalesced += 1
+        if not leader:
+            load.done.wait()
+            return load.result
+        try:
+            value, error = loader()
+            if error is None:
+                self.put(key, value)
+            load.result = (value, error)
+        finally:
+            with self._lock:
+                del self._loading[key]
+            load.done.set()
+        return load.result
+
+    def clear(self):
+        with self._lock:
+            self._items.clear()
+
+    def __len__(self):
+        with self._lock:
+            return len(self._items)
@@ -0,0 +1,255 @@
+"""
+本地分析服务：常驻进程，在内存中缓存解析好的序列，供macd.py、macdzs.py、mockTrack.py和GUI作为瘦客户端调用
+
+    python service.py                          在 127.0.0.1:8780 启动
+    MAIRUI_SERVICE=http://127.0.0.1:8780 python macd.py
+
+接口（GET，返回JSON）：
+    /zscore?code=&endpoint=&license=&days=365&asof=YYYY-MM-DD     过去days天窗口的DIF统计（macd.py口径）
+    /series?code=&endpoint=&license=&adjust=                     日期和DIF序列（GUI自行生成Z-score历史表）
+    /screen?list=macd|macdzs&days=&asof=                         自选股列表的Z-score和排名
+    /backtest?code=&market=hsstock&license=&buy=&sell=&warmup=&window=   mockTrack口径的回测和交易流水
+    /health                                                      缓存命中情况
+出错时返回 {"error": 错误信息}。
+"""
+import argparse
+import json
+import math
+import threading
+from datetime import datetime, timedelta
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlsplit
+
+import numpy as np
+
+from backtest import BUY_THRESHOLD, SELL_THRESHOLD, WARMUP, max_drawdown, simulate
+from barcache import MAX_AGE, get_bars
+from bars import format_dates, select, to_datetime64
+import mockTrack
+from indicators import macd
+from rolling import zscore_series
+from screener import align, screen
+from seriescache import SeriesCache
+
+HOST = "127.0.0.1"
+PORT = 8780
+MAX_SERIES = 512       # 内存中最多保存的序列数
+
+_series = SeriesCache(maxsize=MAX_SERIES, ttl=MAX_AGE)
+
+
+def load(endpoint, code, license, adjust=None):
+    """读取一条序列：内存缓存命中直接返回，否则经本地磁盘缓存/API读取并复制到内存"""
+    def loader():
+        bars, error = get_bars(endpoint, code, "d", license, adjust)
+        if error:
+            return None, error
+        return {name: np.array(values) for name, values in bars.items()}, None
+    return _series.get_or_load((endpoint, code, adjust), loader)
+
+
+def _asof(value):
+    return datetime.strptime(value, "%Y-%m-%d") if value else datetime.now()
+
+
+def zscore(code, endpoint="hszbl/macd", license="", days=365, asof=None, adjust=None):
+    """截至asof（含当天）过去days天的DIF统计，口径与macd.analyze_stock一致"""
+    bars, error = load(endpoint, code, license, adjust)
+    if error:
+        return None, error
+    asof = _asof(asof)
+    diff_values = select(bars, asof - timedelta(days=days), asof + timedelta(days=1))["diff"]
+    if len(diff_values) < 2:
+        return None, f"数据不足（需要至少2个数据点，当前有{len(diff_values)}个）"
+    mean_diff = float(np.mean(diff_values))
+    std_diff = float(np.std(diff_values))
+    current_diff = float(diff_values[-1])
+    if not std_diff > 0:
+        return None, "标准差为0（窗口内DIF没有变化），无法计算Z-score"
+    return {
+        "code": code,
+        "current_diff": current_diff,
+        "z_score": (current_diff - mean_diff) / std_diff,
+        "buy_diff": mean_diff + std_diff,
+        "sell_diff": mean_diff - std_diff,
+        "count": len(diff_values),
+    }, None
+
+
+def series(code, endpoint="hsstock/history/macd", license="", adjust=None):
+    """日期（秒级时间戳）和DIF序列"""
+    bars, error = load(endpoint, code, license, adjust)
+    if error:
+        return None, error
+    return {"t": bars["t"].astype(np.int64).tolist(), "diff": bars["diff"].tolist()}, None
+
+
+def screen_list(name, days=None, asof=None):
+    """对macd.py或macdzs.py的自选股列表做Z-score扫描，返回与列表同序的结果"""
+    if name == "macdzs":
+        import macdzs as module
+        endpoint, days = "hsindex/history/macd", days or 365 * 2
+    else:
+        import macd as module
+        endpoint, days = "hszbl/macd", days or 365
+    loaded = [load(endpoint, stock["code"], module.LICENSE) for stock in module.STOCK_LIST]
+    dates, matrix = align([bars for bars, _ in loaded])
+    result = screen(dates, matrix, to_datetime64(_asof(asof)), days)
+    rows = []
+    for i, (stock, (_, error)) in enumerate(zip(module.STOCK_LIST, loaded)):
+        row = {"code": stock["code"], "name": stock["name"], "error": error}
+        row.update({field: values[i].item() for field, values in result.items()})
+        rows.append(row)
+    return rows, None
+
+
+def backtest(code, market="hsstock", license="", buy=BUY_THRESHOLD, sell=SELL_THRESHOLD, warmup=WARMUP, window=None):
+    """
+    mockTrack口径的回测（2020-01-01至2026-01-20），返回汇总和交易流水
+
+    与mockTrack.LOCAL_MACD一致：默认使用API的diff，本地计算时在完整历史上算MACD再截取区间。
+    """
+    adjust = "n" if market == "hsstock" else None
+    bars, error = load(f"{market}/history", code, license, adjust)
+    if error:
+        return None, error
+    if mockTrack.LOCAL_MACD:
+        bars = {**bars, "diff": macd(bars["c"])["diff"]}
+    bars = select(bars, "2020-01-01", "2026-01-21")
+    if len(bars["t"]) < 2:
+        return None, f"数据不足（需要至少2个数据点，当前有{len(bars['t'])}个）"
+    if mockTrack.LOCAL_MACD:
+        diff_values = bars["diff"]
+    else:
+        macd_bars, error = load(f"{market}/history/macd", code, license, adjust)
+        if error:
+            return None, error
+        diff_values = select(macd_bars, "2020-01-01", "2026-01-21")["diff"]
+        if len(diff_values) != len(bars["t"]):
+            return None, f"长度不一致，{len(diff_values)} {len(bars['t'])}"
+    z_scores, _, _ = zscore_series(diff_values, window=window, exclude_current=True)
+    ledger = simulate(z_scores, bars["c"], bars["t"], diff_values, buy, sell, warmup)
+    return {
+        "final_profit": ledger["final_profit"],
+        "trade_count": ledger["trade_count"],
+        "max_drawdown": max_drawdown(ledger["equity"]),
+        "ledger": {
+            "date": format_dates(ledger["date"]).tolist(),
+            **{field: ledger[field].tolist() for field in ("side", "price", "diff", "z_score", "trade_profit", "total_profit")},
+        },
+    }, None
+
+
+def health():
+    return {"status": "ok", "series": len(_series), "hits": _series.hits, "misses": _series.misses,
+            "coalesced": _series.coalesced}, None
+
+
+def _json_safe(data):
+    """NaN和无穷大不是合法的JSON，转换成null"""
+    if isinstance(data, float):
+        return data if math.isfinite(data) else None
+    if isinstance(data, dict):
+        return {key: _json_safe(value) for key, value in data.items()}
+    if isinstance(data, (list, tuple)):
+        return [_json_safe(value) for value in data]
+    return data
+
+
+def _float(value, default):
+    return float(value) if value not in (None, "") else default
+
+
+def _int(value, default):
+    return int(value) if value not in (None, "") else default
+
+
+ROUTES = {
+    "/zscore": lambda q: zscore(q["code"], q.get("endpoint", "hszbl/macd"), q.get("license", ""),
+                                _int(q.get("days"), 365), q.get("asof"), q.get("adjust")),
+    "/series": lambda q: series(q["code"], q.get("endpoint", "hsstock/history/macd"), q.get("license", ""),
+                                q.get("adjust")),
+    "/screen": lambda q: screen_list(q.get("list", "macd"), _int(q.get("days"), None), q.get("asof")),
+    "/backtest": lambda q: backtest(q["code"], q.get("market", "hsstock"), q.get("license", ""),
+                                    _float(q.get("buy"), BUY_THRESHOLD), _float(q.get("sell"), SELL_THRESHOLD),
+                                    _int(q.get("warmup"), WARMUP), _int(q.get("window"), None)),
+    "/health": lambda q: health(),
+}
+
+
+class ServiceHandler(BaseHTTPRequestHandler):
+    server_version = "MacdService/1.0"
+
+    def log_message(self, format, *args):
+        pass
+
+    def _send(self, status, data):
+        body = json.dumps(_json_safe(data), ensure_ascii=False, allow_nan=False).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json; charset=utf-8")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def do_GET(self):
+        url = urlsplit(self.path)
+        route = ROUTES.get(url.path)
+        if route is None:
+            self._send(404, {"error": f"未知接口 {url.path}"})
+            return
+        query = {key: values[0] for key, values in parse_qs(url.query).items()}
+        try:
+            data, error = route(query)
+        except KeyError as e:
+            self._send(400, {"error": f"缺少参数 {e.args[0]}"})
+            return
+        except ValueError as e:
+            self._send(400, {"error": f"参数错误: {str(e)}"})
+            return
+        except Exception as e:
+            self._send(500, {"error": f"处理失败: {str(e)}"})
+            return
+        if error:
+            self._send(502, {"error": error})
+        else:
+            self._send(200, data)
+
+
+class AnalysisService(ThreadingHTTPServer):
+    daemon_threads = True
+
+    def __init__(self, address=(HOST, PORT)):
+        super().__init__(address, ServiceHandler)
+
+    @property
+    def base_url(self):
+        host, port = self.server_address[:2]
+        return f"http://{host}:{port}"
+
+
+def start(host=HOST, port=PORT):
+    """在后台线程启动服务，返回服务器对象"""
+    server = AnalysisService((host, port))
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+def main():
+    parser = argparse.ArgumentParser(description="本地分析服务")
+    parser.add_argument("--host", default=HOST)
+    parser.add_argument("--port", type=int, default=PORT)
+    args = parser.parse_args()
+
+    server = AnalysisService((args.host, args.port))
+    print(f"分析服务已启动：{server.base_url}")
+    print(f"设置环境变量 MAIRUI_SERVICE={server.base_url} 后各脚本通过服务获取结果")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+
+
+if __name__ == "__main__":
+    main()
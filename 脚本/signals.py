@@ -0,0 +1,328 @@
+"""
+组合信号：把金叉、上穿0轴、Z-score区间、RSI、布林带突破等条件写成数组表达式，按需计算
+
+表达式只描述计算关系，交给Frame时才计算；同一个Frame中结构相同的子表达式（如EMA、滚动统计）
+只算一次。数据列可以是一维序列，也可以是 日期×股票 的二维矩阵（整个自选股列表一起计算）。
+
+    python signals.py                       macd.py自选股最近5个交易日出现的信号
+    python signals.py --list mock --days 20
+
+    entry = GOLDEN_CROSS & (Z_SCORE > 0.5)
+    frame = Frame({"c": close, "diff": diff})
+    buy = frame.evaluate(entry)
+"""
+import argparse
+
+import numpy as np
+
+from backtest import BUY_THRESHOLD, SELL_THRESHOLD, WARMUP, signal_state, simulate
+from bars import format_dates
+from indicators import FAST, SIGNAL, SLOW, ema as _ema
+from mairui import print_usage
+from rolling import rolling_mean_std, zscore_series
+from screener import align
+
+RSI_PERIOD = 14
+BOLL_WINDOW = 20
+BOLL_WIDTH = 2.0
+DAYS = 5               # 报告中列出最近几个交易日出现的信号
+
+
+class Expr:
+    """
+    信号表达式节点：op为运算名，args为子表达式，params为参数
+
+    key由运算名、子表达式的key和参数组成，结构相同的表达式key相同，在Frame中共用一次计算结果。
+    支持 + - * / 比较运算和 & | ~ 组合条件；不重载==，以免影响作为字典键使用。
+    """
+
+    def __init__(self, op, *args, **params):
+        self.op = op
+        self.args = tuple(arg if isinstance(arg, Expr) else const(arg) for arg in args)
+        self.params = params
+        self.key = (op, tuple(arg.key for arg in self.args), tuple(sorted(params.items())))
+
+    def __repr__(self):
+        params = ", ".join(f"{name}={value!r}" for name, value in self.params.items())
+        return f"{self.op}({', '.join([repr(arg) for arg in self.args] + ([params] if params else []))})"
+
+    def __add__(self, other): return Expr("add", self, other)
+    def __radd__(self, other): return Expr("add", other, self)
+    def __sub__(self, other): return Expr("sub", self, other)
+    def __rsub__(self, other): return Expr("sub", other, self)
+    def __mul__(self, other): return Expr("mul", self, other)
+    def __rmul__(self, other): return Expr("mul", other, self)
+    def __truediv__(self, other): return Expr("div", self, other)
+    def __rtruediv__(self, other): return Expr("div", other, self)
+    def __neg__(self): return Expr("neg", self)
+    def __gt__(self, other): return Expr("gt", self, other)
+    def __ge__(self, other): return Expr("ge", self, other)
+    def __lt__(self, other): return Expr("lt", self, other)
+    def __le__(self, other): return Expr("le", self, other)
+    def __and__(self, other): return Expr("and", self, other)
+    def __or__(self, other): return Expr("or", self, other)
+    def __invert__(self): return Expr("not", self)
+
+
+def const(value):
+    return Expr("const", value=float(value))
+
+
+def field(name, default=None):
+    """数据列；Frame中没有该列时改为计算default表达式（例如由收盘价计算DIF）"""
+    return Expr("field", *([default] if default is not None else []), name=name)
+
+
+def ema(x, span):
+    return Expr("ema", x, span=span)
+
+
+def shift(x):
+    """前一个交易日的值，第一个为NaN"""
+    return Expr("shift", x)
+
+
+def maximum(x, y):
+    return Expr("maximum", x, y)
+
+
+def fillna(x, value=0.0):
+    return Expr("fillna", x, value)
+
+
+def zscore(x, window=None, exclude_current=False):
+    """rolling.zscore_series的Z-score，window为None时为扩展窗口"""
+    return Expr("zscore", x, window=window, exclude_current=exclude_current)
+
+
+def rolling_mean(x, window):
+    return Expr("item", Expr("moments", x, window=window), index=0)
+
+
+def rolling_std(x, window):
+    return Expr("item", Expr("moments", x, window=window), index=1)
+
+
+def crosses_above(x, y):
+    """当天x在y之上、前一天不在y之上"""
+    return Expr("cross_up", x - y)
+
+
+def crosses_below(x, y):
+    return Expr("cross_down", x - y)
+
+
+def rsi(close, period=RSI_PERIOD):
+    """相对强弱指标（Wilder平滑，即a=1/period的EMA）"""
+    change = fillna(close - shift(close))
+    gain = ema(maximum(change, 0.0), 2 * period - 1)
+    loss = ema(maximum(-change, 0.0), 2 * period - 1)
+    return 100.0 * gain / (gain + loss)
+
+
+def bollinger(close, window=BOLL_WINDOW, width=BOLL_WIDTH):
+    """布林带 (中轨, 上轨, 下轨)，标准差为总体标准差"""
+    middle = rolling_mean(close, window)
+    std = rolling_std(close, window)
+    return middle, middle + width * std, middle - width * std
+
+
+def _shift(x):
+    x = np.asarray(x, dtype=np.float64)
+    return np.concatenate((np.full((1,) + x.shape[1:], np.nan), x[:-1]))[:len(x)]
+
+
+OPS = {
+    "add": np.add,
+    "sub": np.subtract,
+    "mul": np.multiply,
+    "div": np.divide,
+    "neg": np.negative,
+    "gt": np.greater,
+    "ge": np.greater_equal,
+    "lt": np.less,
+    "le": np.less_equal,
+    "and": np.logical_and,
+    "or": np.logical_or,
+    "not": np.logical_not,
+    "maximum": np.maximum,
+    "fillna": lambda x, value: np.where(np.isnan(x), value, x),
+    "shift": _shift,
+    "ema": lambda x, span: _ema(x, span),
+    "zscore": lambda x, window, exclude_current: zscore_series(x, window=window, exclude_current=exclude_current)[0],
+    "moments": lambda x, window: rolling_mean_std(x, window),
+    "item": lambda x, index: x[index],
+    "cross_up": lambda x: (x > 0) & (_shift(x) <= 0),
+    "cross_down": lambda x: (x < 0) & (_shift(x) >= 0),
+}
+
+
+class Frame:
+    """
+    一组数据列上的表达式求值器，缓存每个已计算的子表达式
+
+    二维矩阵中的NaN（未上市、停牌）：先把每列的有效值按顺序移到列首再整体计算，
+    结果放回原位置，因此每支股票的EMA、滚动统计和"前一天"都只用它自己有数据的交易日，
+    与逐支单独计算一致。无效位置的结果为NaN（条件为False）。
+    """
+
+    def __init__(self, columns):
+        self.columns = {name: np.asarray(values, dtype=np.float64) for name, values in columns.items()}
+        shapes = {values.shape for values in self.columns.values()}
+        if len(shapes) != 1:
+            raise ValueError(f"数据列形状不一致: {sorted(shapes)}")
+        self.valid = np.logical_and.reduce([~np.isnan(values) for values in self.columns.values()])
+        self.order = None
+        if not self.valid.all():
+            self.order = np.argsort(~self.valid, axis=0, kind="stable")
+            self.columns = {name: np.take_along_axis(values, self.order, axis=0)
+                            for name, values in self.columns.items()}
+        self.cache = {}
+        self.computed = 0
+
+    def _evaluate(self, expr):
+        result = self.cache.get(expr.key)
+        if result is not None:
+            return result
+        if expr.op == "const":
+            result = np.float64(expr.params["value"])
+        elif expr.op == "field":
+            name = expr.params["name"]
+            if name in self.columns:
+                result = self.columns[name]
+            elif expr.args:
+                result = self._evaluate(expr.args[0])
+            else:
+                raise KeyError(f"缺少数据列 {name}")
+        else:
+            with np.errstate(invalid="ignore", divide="ignore"):
+                result = OPS[expr.op](*[self._evaluate(arg) for arg in expr.args], **expr.params)
+            self.computed += 1
+        self.cache[expr.key] = result
+        return result
+
+    def evaluate(self, expr):
+        """计算一个表达式，返回与数据列同形状的数组"""
+        result = np.broadcast_to(self._evaluate(expr), self.valid.shape)
+        if self.order is not None:
+            restored = np.empty(result.shape, dtype=result.dtype)
+            np.put_along_axis(restored, self.order, result, axis=0)
+            result = restored
+        else:
+            result = result.copy()
+        result[~self.valid] = False if result.dtype == bool else np.nan
+        return result
+
+    def evaluate_all(self, exprs):
+        """计算 {名称: 表达式}，共用中间结果"""
+        return {name: self.evaluate(expr) for name, expr in exprs.items()}
+
+
+def evaluate(exprs, columns):
+    """在columns上计算 {名称: 表达式}"""
+    return Frame(columns).evaluate_all(exprs)
+
+
+CLOSE = field("c")
+DIF = field("diff", ema(CLOSE, FAST) - ema(CLOSE, SLOW))
+DEA = ema(DIF, SIGNAL)
+MACD = 2.0 * (DIF - DEA)
+Z_SCORE = zscore(DIF, exclude_current=True)   # mockTrack口径：第i天只用之前的DIF
+RSI = rsi(CLOSE)
+BOLL_MIDDLE, BOLL_UPPER, BOLL_LOWER = bollinger(CLOSE)
+
+GOLDEN_CROSS = crosses_above(DIF, DEA)
+DEATH_CROSS = crosses_below(DIF, DEA)
+ZERO_UP = crosses_above(DIF, 0.0)
+ZERO_DOWN = crosses_below(DIF, 0.0)
+Z_BUY = Z_SCORE > BUY_THRESHOLD
+Z_SELL = Z_SCORE < SELL_THRESHOLD
+
+# 报告中列出的信号：名称 -> (说明, 表达式)
+SIGNALS = {
+    "golden_cross": ("DIF上穿DEA（金叉）", GOLDEN_CROSS),
+    "death_cross": ("DIF下穿DEA（死叉）", DEATH_CROSS),
+    "zero_up": ("DIF上穿0轴", ZERO_UP),
+    "zero_down": ("DIF下穿0轴", ZERO_DOWN),
+    "z_buy": (f"Z-score > {BUY_THRESHOLD}", Z_BUY),
+    "z_sell": (f"Z-score < {SELL_THRESHOLD}", Z_SELL),
+    "rsi_oversold": ("RSI < 30（超卖）", RSI < 30.0),
+    "rsi_overbought": ("RSI > 70（超买）", RSI > 70.0),
+    "boll_up": ("收盘价突破布林上轨", crosses_above(CLOSE, BOLL_UPPER)),
+    "boll_down": ("收盘价跌破布林下轨", crosses_below(CLOSE, BOLL_LOWER)),
+}
+
+
+def backtest_columns(frame, close, entry, exit, warmup=WARMUP):
+    """
+    按买入、卖出条件对矩阵的每一列回测（全仓进出，与mockTrack相同），返回每列的最终收益数组
+
+    持仓状态整体计算，每列只在自己有数据的交易日上生成流水。
+    """
+    close = np.asarray(close, dtype=np.float64)
+    z_scores = frame.evaluate(Z_SCORE)
+    buy, sell = frame.evaluate(entry), frame.evaluate(exit)
+    profits = np.full(close.shape[1], np.nan)
+    for column in range(close.shape[1]):
+        valid = frame.valid[:, column]
+        if valid.sum() < 2:
+            continue
+        held = signal_state(buy[valid, column], sell[valid, column], warmup)
+        profits[column] = simulate(z_scores[valid, column], close[valid, column], held=held)["final_profit"]
+    return profits
+
+
+def print_signals(stocks, dates, frame, values, profits, days=DAYS):
+    """每支股票一行：最新的DIF、Z-score、RSI，策略收益，以及最近days个交易日出现的信号"""
+    print("="*80)
+    print(f"{'代码':<10} {'名称':<8} {'日期':<10} {'DIF':>8} {'Z-score':>8} {'RSI':>6} {'策略收益':>12}  最近{days}日信号")
+    print("-"*80)
+    labels = format_dates(dates)
+    for column, stock in enumerate(stocks):
+        rows = np.flatnonzero(frame.valid[:, column])
+        if len(rows) == 0:
+            continue
+        last = rows[-1]
+        recent = rows[-days:]
+        fired = []
+        for name, (title, _) in SIGNALS.items():
+            hits = recent[values[name][recent, column]]
+            if len(hits):
+                fired.append(f"{title}({labels[hits[-1]][5:]})")
+        print(f"{stock['code']:<10} {stock['name']:<8} {labels[last]:<10} {values['dif'][last, column]:>8.3f} "
+              f"{values['z_score'][last, column]:>8.2f} {values['rsi'][last, column]:>6.1f} "
+              f"{profits[column]:>12.2f}  {'、'.join(fired) or '-'}")
+    print("="*80)
+
+
+def main():
+    import mockTrack
+    from runner import add_list_argument, fetch_all, load_list
+
+    parser = argparse.ArgumentParser(description="自选股组合信号扫描")
+    add_list_argument(parser)
+    parser.add_argument("--days", type=int, default=DAYS, help="列出最近几个交易日出现的信号")
+    args = parser.parse_args()
+
+    stocks, market = load_list(args.list)
+
+    fetched = fetch_all(stocks, market)
+    for stock, (_, error) in zip(stocks, fetched):
+        if error:
+            print(f"{stock['code']} {stock['name']} {error}")
+    histories = [{"t": series["dates"], "c": series["close"], "diff": series["diff"]} if series else None
+                 for series, _ in fetched]
+    dates, close = align(histories, "c")
+    _, diff = align(histories, "diff")
+
+    frame = Frame({"c": close, "diff": diff})
+    values = frame.evaluate_all({name: expr for name, (_, expr) in SIGNALS.items()})
+    values.update(frame.evaluate_all({"dif": DIF, "z_score": Z_SCORE, "rsi": RSI}))
+    profits = backtest_columns(frame, close, mockTrack.ENTRY, mockTrack.EXIT)
+    print_signals(stocks, dates, frame, values, profits, args.days)
+    print(f"共 {len(stocks)} 支，计算中间结果 {frame.computed} 个")
+    print_usage()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,124 @@
+"""参数扫描：对买卖阈值、预热长度、回看窗口的所有组合做批量回测并排名"""
+import itertools
+import sys
+
+import numpy as np
+
+from backtest import INITIAL_CASH
+from rolling import zscore_series
+
+# 每个分块最多占用的持仓矩阵元素数（约64MB的float64）
+CHUNK_ELEMENTS = 8_000_000
+
+SWEEP_DTYPE = np.dtype([
+    ("buy_threshold", np.float64),
+    ("sell_threshold", np.float64),
+    ("warmup", np.int64),
+    ("window", np.int64),        # 0 表示扩展窗口（使用全部历史）
+    ("final_profit", np.float64),
+    ("trade_count", np.int64),
+    ("max_drawdown", np.float64),
+])
+
+
+def _holding_matrix(z_scores, buy_thresholds, sell_thresholds, warmups):
+    """一次算出多组参数的持仓状态，每行对应一组参数"""
+    n = len(z_scores)
+    bars = np.arange(n)
+    tradable = bars[None, :] >= warmups[:, None]
+    signal = np.full((len(buy_thresholds), n), -1, dtype=np.int8)
+    signal[tradable & (z_scores[None, :] > buy_thresholds[:, None])] = 1
+    signal[tradable & (z_scores[None, :] < sell_thresholds[:, None])] = 0
+
+    # 沿时间轴前向填充最近一次信号
+    last = np.where(signal >= 0, bars[None, :], -1)
+    np.maximum.accumulate(last, axis=1, out=last)
+    latest = np.take_along_axis(signal, np.maximum(last, 0), axis=1)
+    return (last >= 0) & (latest == 1)
+
+
+def _evaluate_chunk(z_scores, log_returns, buy_thresholds, sell_thresholds, warmups):
+    """按对数收益计算一组参数的最终收益、交易次数和最大回撤"""
+    held = _holding_matrix(z_scores, buy_thresholds, sell_thresholds, warmups)
+    # 第i天收盘持仓则获得第i+1天的收益；期末持仓按最后收盘价平仓，与backtest.simulate一致
+    growth = np.cumsum(held[:, :-1] * log_returns[None, :], axis=1)
+    final_profit = INITIAL_CASH * np.expm1(growth[:, -1]) if growth.shape[1] else np.zeros(len(held))
+    trade_count = np.count_nonzero(np.diff(held.astype(np.int8), axis=1, prepend=0) == 1, axis=1)
+    peak = np.maximum.accumulate(np.maximum(growth, 0.0), axis=1)
+    max_drawdown = -np.expm1(np.min(growth - peak, axis=1, initial=0.0))
+    return final_profit, trade_count, max_drawdown
+
+
+def sweep(diff_values, prices, buy_thresholds, sell_thresholds, warmups, windows=(None,), start=0):
+    """
+    对所有参数组合做回测，返回按最终收益降序排列的结构化数组
+
+    windows中的None表示扩展窗口（mockTrack默认口径），整数表示固定长度的回看窗口。
+    买入阈值低于卖出阈值的组合没有意义，会被跳过。同一个回看窗口的zScore只计算一次，
+    其余参数按分块组成矩阵一次性回测。
+    start大于0时zScore仍用全部数据计算，只回测start及之后的部分（预热从start算起），
+    用于滚动优化中在样本内区间选参数。
+    """
+    diff_values = np.asarray(diff_values, dtype=np.float64)
+    prices = np.asarray(prices, dtype=np.float64)
+    if len(diff_values) != len(prices):
+        raise ValueError(f"长度不一致，{len(diff_values)} {len(prices)}")
+    log_returns = np.diff(np.log(prices))[start:]
+
+    combos = np.array([(b, s, w) for b, s, w in itertools.product(buy_thresholds, sell_thresholds, warmups) if b >= s],
+                      dtype=np.float64).reshape(-1, 3)
+    chunk = max(1, CHUNK_ELEMENTS // max(len(prices) - start, 1))
+    parts = []
+    for window in windows:
+        z_scores = zscore_series(diff_values, window=window, exclude_current=True)[0][start:]
+        for offset in range(0, len(combos), chunk):
+            part = combos[offset:offset + chunk]
+            warmups_part = part[:, 2].astype(np.int64)
+            final_profit, trade_count, max_drawdown = _evaluate_chunk(
+                z_scores, log_returns, part[:, 0], part[:, 1], warmups_part)
+            rows = np.empty(len(part), dtype=SWEEP_DTYPE)
+            rows["buy_threshold"] = part[:, 0]
+            rows["sell_threshold"] = part[:, 1]
+            rows["warmup"] = warmups_part
+            rows["window"] = window or 0
+            rows["final_profit"] = final_profit
+            rows["trade_count"] = trade_count
+            rows["max_drawdown"] = max_drawdown
+            parts.append(rows)
+
+    table = np.concatenate(parts) if parts else np.empty(0, dtype=SWEEP_DTYPE)
+    return table[np.argsort(-table["final_profit"], kind="stable")]
+
+
+def print_sweep(table, top=20):
+    """打印排名靠前的参数组合"""
+    print("="*80)
+    print(f"{'排名':<6} {'买入阈值':<8} {'卖出阈值':<8} {'预热':<6} {'窗口':<6} {'最终收益':<14} {'交易次数':<8} {'最大回撤':<8}")
+    print("-"*80)
+    for rank, row in enumerate(table[:top], 1):
+        window = row["window"] if row["window"] else "全部"
+        print(f"{rank:<8} {row['buy_threshold']:<12.2f} {row['sell_threshold']:<12.2f} {row['warmup']:<8} {window:<8} "
+              f"{row['final_profit']:<18.2f} {row['trade_count']:<12} {row['max_drawdown']:<8.2%}")
+    print("="*80)
+
+
+def main():
+    import mockTrack
+
+    codes = sys.argv[1:] or [stock["code"] for stock in mockTrack.STOCK_LIST]
+    for code in codes:
+        series, error = mockTrack.load_series({"code": code, "name": code})
+        if error:
+            print(f"{code} {error}")
+            continue
+        table = sweep(series["diff"], series["close"],
+                      buy_thresholds=np.round(np.arange(0.0, 2.51, 0.25), 2),
+                      sell_thresholds=np.round(np.arange(-2.5, 0.01, 0.25), 2),
+                      warmups=[60, 120, 200, 250],
+                      windows=[None, 120, 250, 500])
+        print(f"{code} 共{len(table)}组参数")
+        print_sweep(table)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,5 @@
+"""脚本目录下的模块按平铺方式互相导入，测试时把它加入搜索路径"""
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
@@ -0,0 +1,16 @@
+import numpy as np
+
+from backtest import print_ledger, simulate
+from bars import format_dates
+
+
+def test_format_dates_empty():
+    assert format_dates(np.array([], dtype="datetime64[s]")).tolist() == []
+
+
+def test_print_ledger_without_trades(capsys):
+    dates = (np.datetime64("2024-01-01") + np.arange(10)).astype("datetime64[s]")
+    ledger = simulate(np.full(10, np.nan), np.linspace(10, 11, 10), dates, np.zeros(10))
+    assert len(ledger["date"]) == 0
+    print_ledger(ledger)
+    assert "最终收益: 0.00 元" in capsys.readouterr().out
@@ -0,0 +1,18 @@
+import pytest
+
+from mairui import _is_quota_error, _is_rate_limited
+
+
+@pytest.mark.parametrize("message", ["请求次数过多", "请求过于频繁，请稍后再试", "每分钟请求次数已达上限", "Too Many Requests"])
+def test_rate_limit_is_not_quota(message):
+    assert _is_rate_limited(message)
+    assert not _is_quota_error(message)
+
+
+@pytest.mark.parametrize("message", [{"error": "许可证调用次数已达上限"}, "您的额度已用完", "证书已过期"])
+def test_quota_messages(message):
+    assert _is_quota_error(message)
+
+
+def test_data_is_not_checked():
+    assert not _is_quota_error([{"error": "额度"}])
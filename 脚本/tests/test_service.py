@@ -0,0 +1,28 @@
+import json
+import urllib.request
+
+import numpy as np
+import pytest
+
+import service
+
+
+@pytest.fixture
+def server(monkeypatch):
+    dates = (np.datetime64("2024-01-01") + np.arange(300)).astype("datetime64[s]")
+    bars = {"t": dates, "c": np.linspace(10, 12, 300), "diff": np.sin(np.arange(300) / 10)}
+    monkeypatch.setattr(service, "load", lambda *args, **kwargs: (bars, None))
+    server = service.start(port=0)
+    yield server
+    server.shutdown()
+    server.server_close()
+
+
+def test_backtest_without_trades(server):
+    # 买入阈值高于任何Z-score，不会产生交易
+    url = f"{server.base_url}/backtest?code=000001&buy=100&sell=-100"
+    with urllib.request.urlopen(url) as response:
+        assert response.status == 200
+        data = json.loads(response.read())
+    assert data["trade_count"] == 0
+    assert data["ledger"]["date"] == []
@@ -0,0 +1,183 @@
+"""
+滚动优化（walk-forward）：在每个样本内区间用参数扫描选出买卖阈值，应用到紧随其后的样本外区间，
+把各样本外区间的权益首尾相接，得到不含未来信息的收益曲线
+
+    python walkforward.py                       macd.py自选股，训练500天、测试125天
+    python walkforward.py --train 750 --test 250 --anchored --list mock
+"""
+import argparse
+import os
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+
+from backtest import BUY_THRESHOLD, INITIAL_CASH, SELL_THRESHOLD, max_drawdown, simulate
+from bars import format_dates
+from mairui import print_usage
+from rolling import zscore_series
+from runner import add_list_argument, fetch_all, load_list
+from sweep import sweep
+
+TRAIN = 500            # 样本内区间长度（数据点数）
+TEST = 125             # 样本外区间长度
+BUY_GRID = np.round(np.arange(0.0, 2.51, 0.25), 2)
+SELL_GRID = np.round(np.arange(-2.5, 0.01, 0.25), 2)
+WINDOWS = (None, 120, 250)
+
+FOLD_DTYPE = np.dtype([
+    ("train_start", np.int64),
+    ("test_start", np.int64),
+    ("test_end", np.int64),
+    ("buy_threshold", np.float64),
+    ("sell_threshold", np.float64),
+    ("window", np.int64),           # 0 表示扩展窗口
+    ("train_profit", np.float64),   # 样本内最优参数的收益（本金为INITIAL_CASH）
+    ("test_return", np.float64),    # 样本外区间的收益率
+    ("test_trades", np.int64),
+])
+
+
+def make_folds(n, train=TRAIN, test=TEST, anchored=False):
+    """
+    切分滚动区间，返回 [(样本内起点, 样本外起点, 样本外终点)]，样本外区间首尾相接
+
+    anchored为True时样本内区间始终从0开始（逐步扩大），否则长度固定为train。
+    """
+    folds = []
+    for test_start in range(train, n - 1, test):
+        folds.append((0 if anchored else test_start - train, test_start, min(test_start + test, n)))
+    return folds
+
+
+def run_fold(diff_values, prices, train_start, test_start, test_end,
+             buy_grid=BUY_GRID, sell_grid=SELL_GRID, windows=WINDOWS):
+    """
+    处理一个区间：在 [train_start, test_start) 上扫描参数，用收益最高的一组回测 [test_start, test_end)
+
+    zScore只用当天之前的数据计算，样本外区间的信号不依赖样本外的数据。样本外区间从空仓开始，
+    区间结束时平仓。返回FOLD_DTYPE的一行和样本外逐日权益（以1为起点）。
+    """
+    diff_values = np.asarray(diff_values[:test_end], dtype=np.float64)
+    prices = np.asarray(prices[:test_end], dtype=np.float64)
+    # zScore用全部历史计算，sweep只回测样本内区间
+    table = sweep(diff_values[:test_start], prices[:test_start], buy_grid, sell_grid, [0], windows, start=train_start)
+    best = table[0]
+    window = int(best["window"]) or None
+
+    z_scores = zscore_series(diff_values, window=window, exclude_current=True)[0]
+    ledger = simulate(z_scores[test_start:], prices[test_start:], buy_threshold=best["buy_threshold"],
+                      sell_threshold=best["sell_threshold"], warmup=0, initial_cash=1.0)
+
+    row = np.zeros((), dtype=FOLD_DTYPE)
+    row["train_start"], row["test_start"], row["test_end"] = train_start, test_start, test_end
+    for name in ("buy_threshold", "sell_threshold", "window"):
+        row[name] = best[name]
+    row["train_profit"] = best["final_profit"]
+    row["test_return"] = ledger["final_profit"]
+    row["test_trades"] = ledger["trade_count"]
+    return row, ledger["equity"]
+
+
+def _run_fold(args):
+    return run_fold(*args)
+
+
+def walk_forward(series_list, train=TRAIN, test=TEST, anchored=False, workers=None,
+                 buy_grid=BUY_GRID, sell_grid=SELL_GRID, windows=WINDOWS):
+    """
+    对多支股票做滚动优化，所有股票的所有区间一起放进进程池并行计算
+
+    series_list为mockTrack.load_series返回的序列（None表示获取失败，结果也为None）。
+    返回与series_list同序的字典列表：folds（FOLD_DTYPE数组）、equity（样本外权益，以INITIAL_CASH为起点）、
+    start（样本外起点下标）、final_profit、max_drawdown，以及同一区间用默认阈值的benchmark_profit。
+    """
+    tasks = []
+    for number, series in enumerate(series_list):
+        if series is None:
+            continue
+        for fold in make_folds(len(series["close"]), train, test, anchored):
+            tasks.append((number, (series["diff"], series["close"], *fold, buy_grid, sell_grid, windows)))
+
+    with ProcessPoolExecutor(max_workers=workers or os.cpu_count()) as pool:
+        outputs = list(pool.map(_run_fold, [args for _, args in tasks], chunksize=max(1, len(tasks) // 64)))
+
+    grouped = {}
+    for (number, _), output in zip(tasks, outputs):
+        grouped.setdefault(number, []).append(output)
+
+    results = []
+    for number, series in enumerate(series_list):
+        if series is None or number not in grouped:
+            results.append(None)
+            continue
+        rows = np.array([row for row, _ in grouped[number]], dtype=FOLD_DTYPE)
+        # 各区间权益按上一区间期末值首尾相接（每段以1为起点）
+        equity, level = [], INITIAL_CASH
+        for _, curve in grouped[number]:
+            equity.append(level * curve)
+            level *= curve[-1]
+        equity = np.concatenate(equity)
+        start = int(rows["test_start"][0])
+
+        z_scores = zscore_series(series["diff"], exclude_current=True)[0]
+        benchmark = simulate(z_scores[start:], series["close"][start:], buy_threshold=BUY_THRESHOLD,
+                             sell_threshold=SELL_THRESHOLD, warmup=0)
+        results.append({
+            "folds": rows,
+            "equity": equity,
+            "start": start,
+            "final_profit": float(equity[-1] - INITIAL_CASH),
+            "max_drawdown": max_drawdown(equity),
+            "benchmark_profit": benchmark["final_profit"],
+        })
+    return results
+
+
+def print_walk_forward(stock, series, result):
+    """打印一支股票各区间选出的参数和样本外表现"""
+    dates = format_dates(series["dates"])
+    print("="*80)
+    print(f"{stock['code']} {stock['name']}")
+    print(f"{'样本内起点':<10} {'样本外区间':<22} {'买入阈值':<8} {'卖出阈值':<8} {'窗口':<6} {'样本外收益':<10} {'交易次数':<8}")
+    print("-"*80)
+    for row in result["folds"]:
+        window = row["window"] if row["window"] else "全部"
+        print(f"{dates[row['train_start']]:<15} {dates[row['test_start']]} - {dates[row['test_end'] - 1]:<12} "
+              f"{row['buy_threshold']:<12.2f} {row['sell_threshold']:<12.2f} {window:<8} "
+              f"{row['test_return']:<14.2%} {row['test_trades']:<8}")
+    print("-"*80)
+    print(f"样本外最终收益: {result['final_profit']:.2f} 元  最大回撤: {result['max_drawdown']:.2%}  "
+          f"同期默认阈值收益: {result['benchmark_profit']:.2f} 元")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="滚动优化买卖阈值并拼接样本外收益")
+    add_list_argument(parser)
+    parser.add_argument("--train", type=int, default=TRAIN, help="样本内区间长度（数据点数）")
+    parser.add_argument("--test", type=int, default=TEST, help="样本外区间长度（数据点数）")
+    parser.add_argument("--anchored", action="store_true", help="样本内区间从头开始逐步扩大")
+    parser.add_argument("--workers", type=int, default=None, help="进程数，默认CPU核数")
+    args = parser.parse_args()
+
+    stocks, market = load_list(args.list)
+
+    fetched = fetch_all(stocks, market)
+    series_list = [series for series, _ in fetched]
+    results = walk_forward(series_list, args.train, args.test, args.anchored, args.workers)
+    profits = []
+    for stock, (series, error), result in zip(stocks, fetched, results):
+        if error or result is None:
+            print(f"{stock['code']} {stock['name']} {error or f'数据不足（需要多于{args.train}个数据点）'}")
+            continue
+        print_walk_forward(stock, series, result)
+        profits.append((result["final_profit"], result["benchmark_profit"]))
+    print("="*80)
+    if profits:
+        profits = np.array(profits)
+        print(f"共 {len(profits)} 支，样本外平均收益: {profits[:, 0].mean():.2f} 元，"
+              f"同期默认阈值平均收益: {profits[:, 1].mean():.2f} 元")
+    print_usage()
+
+
+if __name__ == "__main__":
+    main()